@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# audio.py - Mixer started on first use, with streamed music
+
+import os
+import sys
+import time
+
+import pygame
+
+# Nothing touches the audio device until music is played, and a machine
+# without one (or a missing file) leaves the game silent rather than failing.
+# Music streams from disk, so a long track costs nothing up front.
+class Audio:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.ready = None  # None until the mixer is tried, then whether it started
+        self.music = None  # path of the track playing
+
+    def start(self):
+        if self.ready is None:
+            self.ready = False
+            if self.enabled:
+                try:
+                    pygame.mixer.init()
+                    self.ready = True
+                except pygame.error as e:
+                    print(f"Audio disabled: {e}", file=sys.stderr)
+        return self.ready
+
+    def play_music(self, path, volume=0.5, loops=-1):
+        if path == self.music or not self.start():
+            return
+        try:
+            pygame.mixer.music.load(path)
+            pygame.mixer.music.set_volume(volume)
+            pygame.mixer.music.play(loops)
+            self.music = path
+        except (pygame.error, FileNotFoundError) as e:
+            print(f"Can't play {path}: {e}", file=sys.stderr)
+
+    def stop(self):
+        if self.ready:
+            pygame.mixer.music.stop()
+            self.music = None
+
+# Cost of starting music by streaming against decoding the whole file
+def benchmark(path=os.path.join(os.path.dirname(os.path.abspath(__file__)), '2.mp3')):
+    audio = Audio()
+    start = time.perf_counter()
+    if not audio.start():
+        return
+    mixer_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    audio.play_music(path)
+    stream_ms = (time.perf_counter() - start) * 1000
+    audio.stop()
+    start = time.perf_counter()
+    try:
+        pygame.mixer.Sound(path)
+    except (pygame.error, FileNotFoundError) as e:
+        print(f"Can't load {path}: {e}", file=sys.stderr)
+        return
+    decode_ms = (time.perf_counter() - start) * 1000
+    print(f"mixer start {mixer_ms:.1f} ms, stream {stream_ms:.1f} ms, full decode {decode_ms:.1f} ms")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# batch.py - Seeded headless runs across worker processes for balancing
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import game
+
+PERCENTILES = (10, 50, 90, 99)
+METRICS = ('score', 'level', 'coins', 'damage_taken', 'kills', 'survived_s')
+
+# One complete headless run. Everything a worker needs travels in the
+# arguments and everything it produces in the returned dict, so workers share
+# nothing and a run gives the same result in any process.
+def run_one(seed, ticks, weapon=0, tick_rate=game.TICK_RATE):
+    world = game.World(seed)
+    world.player.weapon = weapon
+    dt = 1000 / tick_rate
+    start = time.process_time()  # CPU time, so summed runs over wall time measure real parallelism
+    for _ in range(ticks):
+        world.step(game.autopilot(world), dt)
+        if world.game_over:
+            break
+    world.close()
+    stats = world.stats
+    return {
+        'seed': seed,
+        'weapon': weapon,
+        'ticks': world.ticks,
+        'died': world.game_over,
+        'survived_s': world.time / 1000,
+        'score': world.score,
+        'level': world.level.num,
+        'coins': stats['coins'],
+        'damage_taken': stats['damage_taken'],
+        'kills': stats['kills'],
+        'room_clears': stats['room_clears'],
+        'cpu_s': time.process_time() - start,
+    }
+
+def run_chunk(seeds, ticks, weapon, tick_rate):
+    return [run_one(seed, ticks, weapon, tick_rate) for seed in seeds]
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def summarize(values):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    row = {f"p{p}": percentile(ordered, p) for p in PERCENTILES}
+    row['mean'] = sum(ordered) / len(ordered)
+    return row
+
+# Percentile rows per metric, plus seconds to clear each kind of room
+def aggregate(runs):
+    table = {metric: summarize([run[metric] for run in runs]) for metric in METRICS}
+    clears = {}
+    for run in runs:
+        for _, _, kind, ms in run['room_clears']:
+            clears.setdefault(kind, []).append(ms / 1000)
+    for kind in sorted(clears):
+        table[f"clear_{kind}_s"] = summarize(clears[kind])
+    table['deaths'] = sum(run['died'] for run in runs)
+    return table
+
+def print_table(table, runs):
+    print(f"{len(runs)} runs, {table['deaths']} deaths")
+    print(f"{'metric':<16}" + "".join(f"{'p' + str(p):>10}" for p in PERCENTILES) + f"{'mean':>10}")
+    for metric, row in table.items():
+        if metric == 'deaths' or row is None:
+            continue
+        print(f"{metric:<16}" + "".join(f"{row[f'p{p}']:>10.2f}" for p in PERCENTILES) + f"{row['mean']:>10.2f}")
+
+# Seeds go out in chunks so the pool isn't dominated by per-task overhead;
+# finished runs are streamed to `out` (JSON lines) and the console as each
+# chunk completes
+def run_batch(runs=200, ticks=10800, workers=None, seed_base=0, weapon=0, tick_rate=game.TICK_RATE,
+              out=None, chunk=None):
+    workers = workers or os.cpu_count() or 1
+    seeds = list(range(seed_base, seed_base + runs))
+    chunk = chunk or max(1, min(16, runs // (workers * 4)))
+    results = []
+    stream = open(out, 'w') if out else None
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_chunk, seeds[i:i + chunk], ticks, weapon, tick_rate)
+                       for i in range(0, len(seeds), chunk)]
+            for future in as_completed(futures):
+                for run in future.result():
+                    results.append(run)
+                    if stream:
+                        stream.write(json.dumps(run) + "\n")
+                if stream:
+                    stream.flush()
+                print(f"\r{len(results)}/{runs} runs", end="", file=sys.stderr, flush=True)
+    finally:
+        if stream:
+            stream.close()
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    cpu = sum(run['cpu_s'] for run in results)
+    print(f"{elapsed:.1f}s wall, {cpu:.1f}s CPU in runs on {workers} workers "
+          f"({cpu / max(elapsed, 1e-9):.2f}x parallel speedup)")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soul Knight Clone batch simulator")
+    parser.add_argument('--runs', type=int, default=200, help="number of seeded runs")
+    parser.add_argument('--ticks', type=int, default=10800, help="tick limit per run")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--seed-base', type=int, default=0, help="first seed; runs use consecutive seeds")
+    parser.add_argument('--weapon', type=int, default=0, choices=range(len(game.WEAPON_NAMES)),
+                        help="autopilot weapon: " + ", ".join(f"{i} {name}" for i, name in enumerate(game.WEAPON_NAMES)))
+    parser.add_argument('--tick-rate', type=int, default=game.TICK_RATE, help="simulation ticks per second")
+    parser.add_argument('--chunk', type=int, help="seeds per worker task")
+    parser.add_argument('--out', help="stream each finished run to this JSON lines file")
+    parser.add_argument('--summary', help="write the percentile table to this JSON file")
+    args = parser.parse_args(argv)
+    runs = run_batch(args.runs, args.ticks, args.workers, args.seed_base, args.weapon, args.tick_rate,
+                     args.out, args.chunk)
+    table = aggregate(runs)
+    print_table(table, runs)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(table, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
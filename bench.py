@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# bench.py - Stress scenarios timing World.step and the draw pass
+
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import pygame
+
+import game
+from pool import instance_size
+
+# Keep the player alive and in place so scenarios measure steady-state load
+def _pin_player(world):
+    world.player.health = 10**9
+    world.player.max_health = 10**9
+
+def _ring(world, count, enemy_type, radius=280):
+    px, py = world.player.center()
+    for i in range(count):
+        angle = 2 * math.pi * i / count
+        world.enemies.append(world.enemy_pool.acquire(px + math.cos(angle) * radius, py + math.sin(angle) * radius, enemy_type))
+
+# Scenarios are (setup, tick) pairs; tick runs untimed before each step and
+# returns the Inputs for it
+def enemy_swarm(enemy_type, count):
+    def setup(world):
+        _pin_player(world)
+        world.enemies.clear()
+        _ring(world, count, enemy_type)
+
+    def tick(world, n):
+        # Top the swarm back up as enemies reach the player
+        missing = count - len(world.enemies)
+        if missing > 0:
+            _ring(world, missing, enemy_type)
+        return game.Inputs()
+    return setup, tick
+
+def machine_gun(count):
+    def setup(world):
+        _pin_player(world)
+        world.player.weapon = 2
+        world.enemies.clear()
+        _ring(world, count, 3)
+
+    def tick(world, n):
+        missing = count - len(world.enemies)
+        if missing > 0:
+            _ring(world, missing, 3)
+        px, py = world.player.center()
+        angle = n * 0.05
+        # Fire every tick rather than at the weapon's normal rate
+        world.player.last_machine_gun_time = -game.MACHINE_GUN_RATE
+        return game.Inputs(mouse_x=px + math.cos(angle) * 300, mouse_y=py + math.sin(angle) * 300, firing=True)
+    return setup, tick
+
+def boss_deaths(per_tick):
+    def setup(world):
+        _pin_player(world)
+        world.enemies.clear()
+
+    def tick(world, n):
+        # Bosses on their last hit point, each with a bullet already inside it
+        for _ in range(per_tick):
+            x = world.rng.uniform(50, game.SCREEN_WIDTH - 100)
+            y = world.rng.uniform(50, game.SCREEN_HEIGHT / 2 - 100)
+            boss = world.enemy_pool.acquire(x, y, 4)
+            boss.health = 1
+            world.enemies.append(boss)
+            bullet = world.bullet_pool.acquire(x + boss.size / 2, y + boss.size / 2, x, y - 1, 10)
+            bullet.dx = bullet.dy = 0
+            world.bullets.append(bullet)
+        return game.Inputs()
+    return setup, tick
+
+def room_transitions():
+    def setup(world):
+        _pin_player(world)
+
+    def tick(world, n):
+        # Clear the room and stand on one of its doors so every step changes
+        # room, wandering the dungeon graph; every 50th tick starts a new level
+        if n % 50 == 49:
+            world.next_level()
+        room = world.current_room
+        world.enemies.clear()
+        room.cleared = True
+        door_x, door_y, _ = room.doors[n % len(room.doors)]
+        world.player.x = door_x - game.PLAYER_SIZE // 2
+        world.player.y = door_y - game.PLAYER_SIZE // 2
+        return game.Inputs()
+    return setup, tick
+
+# A room screens x screens in size with enemies scattered across it and the
+# player walking a loop, so the camera scrolls; draw time should stay near a
+# one-screen room's because everything off the view is culled
+def large_room(count, screens=8):
+    def setup(world):
+        _pin_player(world)
+        room = game.Room(-1, enemy_pool=world.enemy_pool,
+                         width=game.SCREEN_WIDTH * screens, height=game.SCREEN_HEIGHT * screens)
+        for _ in range(count):
+            x = world.rng.uniform(0, room.width - game.ENEMY_SIZE)
+            y = world.rng.uniform(0, room.height - game.ENEMY_SIZE)
+            room.enemies.append(world.enemy_pool.acquire(x, y, 0))
+        world.current_room = room
+        world.enemies = room.enemies
+        world.place_players()
+
+    def tick(world, n):
+        leg = (n // 120) % 4
+        return game.Inputs(right=leg == 0, down=leg == 1, left=leg == 2, up=leg == 3)
+    return setup, tick
+
+def scenarios(enemies=200):
+    named = [(f"swarm_type{enemy_type}", enemy_swarm(enemy_type, enemies)) for enemy_type in range(5)]
+    named.append(("machine_gun", machine_gun(enemies // 4)))
+    named.append(("boss_deaths", boss_deaths(10)))
+    named.append(("room_transitions", room_transitions()))
+    named.append(("large_room", large_room(enemies * 10)))
+    return named
+
+def entity_sizes():
+    samples = {
+        'Enemy': game.Enemy(0, 0, 0),
+        'Bullet': game.Bullet(0, 0, 1, 1),
+        'Coin': game.Coin(0, 0),
+        'PowerUp': game.PowerUp(0, 0, 0),
+    }
+    return {name: instance_size(obj) for name, obj in samples.items()}
+
+def summarize(samples):
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        'mean': sum(ordered) / n,
+        'p50': ordered[n // 2],
+        'p99': ordered[min(n - 1, int(n * 0.99))],
+        'max': ordered[-1],
+    }
+
+def run_scenario(screen, setup, tick, ticks, seed, trace=False):
+    world = game.World(seed)
+    renderer = game.Renderer(screen)
+    setup(world)
+    dt = 1000 / game.FPS
+    update_ms = []
+    draw_ms = []
+    if trace:
+        tracemalloc.start()
+    for n in range(ticks):
+        inputs = tick(world, n)
+        start = time.perf_counter()
+        world.step(inputs, dt)
+        mid = time.perf_counter()
+        renderer.draw(world, 0)
+        end = time.perf_counter()
+        update_ms.append((mid - start) * 1000)
+        draw_ms.append((end - mid) * 1000)
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    world.close()
+    pools = world.pool_stats().values()
+    allocations = {
+        'created_per_tick': sum(pool['created'] for pool in pools) / ticks,
+        'acquired_per_tick': sum(pool['acquired'] for pool in pools) / ticks,
+    }
+    return update_ms, draw_ms, peak, allocations
+
+# Timings come from an untraced pass; peak allocation from a shorter second
+# pass under tracemalloc, which would otherwise distort the timings
+def run_benchmarks(ticks=600, enemies=200, seed=1, out='bench_results.json', compare=None, threshold=0.15):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    screen = pygame.display.set_mode((game.SCREEN_WIDTH, game.SCREEN_HEIGHT))
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+            'ticks': ticks,
+            'enemies': enemies,
+            'seed': seed,
+            'entity_bytes': entity_sizes(),
+        },
+        'scenarios': {},
+    }
+    print(f"{'scenario':<18} {'update p50':>10} {'p99':>8} {'max':>8} {'draw p50':>10} {'p99':>8} {'max':>8} {'peak KiB':>9}")
+    for name, (setup, tick) in scenarios(enemies):
+        update_ms, draw_ms, _, allocations = run_scenario(screen, setup, tick, ticks, seed)
+        _, _, peak, _ = run_scenario(screen, setup, tick, max(1, ticks // 4), seed, trace=True)
+        update = summarize(update_ms)
+        draw = summarize(draw_ms)
+        results['scenarios'][name] = {'update_ms': update, 'draw_ms': draw, 'peak_alloc_kib': peak / 1024,
+                                      'pool': allocations}
+        print(f"{name:<18} {update['p50']:>10.3f} {update['p99']:>8.3f} {update['max']:>8.3f} "
+              f"{draw['p50']:>10.3f} {draw['p99']:>8.3f} {draw['max']:>8.3f} {peak / 1024:>9.1f}")
+    pygame.quit()
+
+    if out:
+        with open(out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {out}")
+    if compare:
+        return compare_results(compare, results, threshold)
+    return 0
+
+# Flag scenarios whose p50 update or draw time grew by more than threshold
+def compare_results(baseline_file, results, threshold):
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    regressions = 0
+    for name, current in results['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if previous is None:
+            continue
+        for phase in ('update_ms', 'draw_ms'):
+            before = previous[phase]['p50']
+            after = current[phase]['p50']
+            if before > 0 and after > before * (1 + threshold):
+                print(f"REGRESSION {name} {phase}: p50 {before:.3f} -> {after:.3f} ms", file=sys.stderr)
+                regressions += 1
+    if regressions == 0:
+        print(f"No regressions against {baseline_file}")
+    return 1 if regressions else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soul Knight Clone benchmarks")
+    parser.add_argument('--seed', type=int, default=1, help="world seed")
+    parser.add_argument('--bench-ticks', type=int, default=600, help="ticks per scenario")
+    parser.add_argument('--bench-enemies', type=int, default=200, help="enemies per swarm scenario")
+    parser.add_argument('--bench-out', default='bench_results.json', help="JSON file for results")
+    parser.add_argument('--bench-compare', help="baseline JSON to check for regressions")
+    args = parser.parse_args(argv)
+    return run_benchmarks(args.bench_ticks, args.bench_enemies, args.seed, args.bench_out, args.bench_compare)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# camera.py - Scrolling camera and an LRU cache of pre-rendered static-layer chunks
+
+import random
+import sys
+import time
+from collections import OrderedDict
+
+import pygame
+
+# A view of view_w x view_h pixels onto a larger world, positioned by its
+# top-left corner in world pixels
+class Camera:
+    def __init__(self, view_w, view_h):
+        self.width = view_w
+        self.height = view_h
+        self.x = 0
+        self.y = 0
+
+    # Centre on (x, y) without showing past the world's edges; a world
+    # smaller than the view is centred instead. Whole pixels, so the static
+    # layer never lands between them.
+    def follow(self, x, y, world_w, world_h):
+        self.x = _clamp_axis(x - self.width / 2, world_w, self.width)
+        self.y = _clamp_axis(y - self.height / 2, world_h, self.height)
+
+    # The view in world pixels as (x, y, w, h), grown by margin on every side
+    def rect(self, margin=0):
+        return (self.x - margin, self.y - margin, self.width + 2 * margin, self.height + 2 * margin)
+
+    def to_world(self, sx, sy):
+        return sx + self.x, sy + self.y
+
+def _clamp_axis(start, world, view):
+    if world <= view:
+        return -((view - world) // 2)
+    return int(round(max(0, min(world - view, start))))
+
+# Square chunks of a static layer, each rendered once by render(surface, x, y)
+# for the chunk whose top-left world pixel is (x, y) and then reused until
+# clear(). Only chunks the camera has looked at get rendered; past capacity
+# the least recently drawn is evicted and its surface reused for the next.
+class ChunkCache:
+    def __init__(self, render, chunk_size=320, capacity=48, like=None):
+        self.render = render
+        self.size = chunk_size
+        self.capacity = capacity
+        self.like = like  # surface whose pixel format chunks are converted to
+        self.chunks = OrderedDict()  # (cx, cy) -> surface, least recently drawn first
+        self.spare = []  # surfaces of cleared chunks
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def clear(self):
+        self.spare.extend(self.chunks.values())
+        self.chunks.clear()
+
+    def chunk(self, cx, cy):
+        key = (cx, cy)
+        surface = self.chunks.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.chunks.move_to_end(key)
+            return surface
+        self.misses += 1
+        if len(self.chunks) >= self.capacity:
+            _, surface = self.chunks.popitem(last=False)
+            self.evictions += 1
+        elif self.spare:
+            surface = self.spare.pop()
+        else:
+            surface = pygame.Surface((self.size, self.size))
+            if self.like is not None:
+                surface = surface.convert(self.like)
+        self.render(surface, cx * self.size, cy * self.size)
+        self.chunks[key] = surface
+        return surface
+
+    # Blit the chunks under the camera's view to target; returns how many
+    def draw(self, target, camera):
+        size = self.size
+        cx0 = camera.x // size
+        cy0 = camera.y // size
+        cx1 = (camera.x + camera.width - 1) // size
+        cy1 = (camera.y + camera.height - 1) // size
+        target.blits([(self.chunk(cx, cy), (cx * size - camera.x, cy * size - camera.y))
+                      for cy in range(cy0, cy1 + 1) for cx in range(cx0, cx1 + 1)], doreturn=False)
+        return (cx1 - cx0 + 1) * (cy1 - cy0 + 1)
+
+    def stats(self):
+        return {'chunks': len(self.chunks), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+# Scroll a screen-sized camera around worlds of growing size, timing a frame
+# composed from cached chunks against drawing the whole static layer
+def benchmark(screens=(1, 4, 16, 64), frames=300, view=(800, 600), seed=1):
+    pygame.display.init()
+    rng = random.Random(seed)
+    print(f"{'screens':>8} {'chunked ms':>11} {'full ms':>9} {'hit rate':>9}")
+    for n in screens:
+        world_w = view[0] * n
+        world_h = view[1]
+        walls = [pygame.Rect(rng.randrange(world_w), rng.randrange(world_h), 20 * rng.randint(1, 3), 20 * rng.randint(2, 5))
+                 for _ in range(40 * n)]
+
+        def render(surface, x, y):
+            surface.fill((20, 20, 50))
+            for wall in walls:
+                surface.fill((70, 70, 100), wall.move(-x, -y))
+
+        screen = pygame.Surface(view)
+        camera = Camera(*view)
+        cache = ChunkCache(render, like=screen)
+        start = time.perf_counter()
+        for frame in range(frames):
+            camera.follow(frame * 20 % world_w, world_h / 2, world_w, world_h)
+            cache.draw(screen, camera)
+        chunked_ms = (time.perf_counter() - start) * 1000 / frames
+        layer = pygame.Surface((world_w, world_h))
+        start = time.perf_counter()
+        for frame in range(frames // 10):
+            render(layer, 0, 0)
+            screen.blit(layer, (-camera.x, -camera.y))
+        full_ms = (time.perf_counter() - start) * 1000 / (frames // 10)
+        stats = cache.stats()
+        hit_rate = stats['hits'] / max(1, stats['hits'] + stats['misses'])
+        print(f"{n:>8} {chunked_ms:>11.3f} {full_ms:>9.3f} {hit_rate:>9.1%}")
+        if chunked_ms > full_ms and n > 1:
+            print(f"chunked layer slower than a full redraw at {n} screens", file=sys.stderr)
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# client.py - Thin co-op client: sends input, draws interpolated server snapshots
+
+import asyncio
+import functools
+import os
+import random
+import socket
+import sys
+import time
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+import game
+import netcode
+from particles import ParticleSystem
+from profiler import Profiler
+from server import GAME_STATES, NET_EVENTS, POSITION_SCALE
+from spatial import SpatialHash
+
+HISTORY = 64  # decoded snapshots kept as delta bases
+FRAMES = 8  # snapshots kept to interpolate between
+INTERP_DELAY = 2  # snapshot intervals drawn behind the newest one
+HELLO_RETRY = 0.5  # s between hellos until welcomed
+CONNECT_TIMEOUT = 10.0  # s
+
+# Rooms are laid out from the seed, so only the ids cross the network;
+# cached here for every client in the process
+@functools.lru_cache(maxsize=4)
+def load_level(seed, level_num):
+    return game.Level(level_num, game.level_seed(seed, level_num))
+
+@functools.lru_cache(maxsize=32)
+def load_room(seed, level_num, room_id):
+    level = load_level(seed, level_num)
+    return game.generate_room(level.seed, room_id, level.graph)
+
+# What a client knows of the game, shaped like the parts of game.World that
+# Renderer and autopilot read. Entities are the game's own classes, filled
+# from snapshots: show() places them between the two snapshots around the
+# tick being drawn, with prev_x/prev_y from the older one and x/y from the
+# newer, and returns how far between them that tick is as the renderer's
+# alpha.
+class ClientWorld:
+    def __init__(self):
+        self.seed = None
+        self.level = None
+        self.current_room = None
+        self.player = None
+        self.players = []
+        self.enemies = []
+        self.bullets = []
+        self.coins = []
+        self.powerups = []
+        self.objects = [{} for _ in range(5)]  # per snapshot table, serial -> entity
+        self.enemy_grid = SpatialHash()
+        self.coin_grid = SpatialHash()
+        self.powerup_grid = SpatialHash()
+        self.particles = ParticleSystem(capacity=1)
+        self.profiler = Profiler()
+        self.stars = []
+        self.score = 0
+        self.ticks = 0
+        self.paused = False
+        self.game_state = 'playing'
+        self.interpolate = True
+
+    def show(self, frames, render_tick, client_id):
+        newer = frames[-1]
+        older = newer
+        for i, frame in enumerate(frames):
+            if frame[0] >= render_tick:
+                newer = frame
+                older = frames[i - 1] if i else frame
+                break
+        tick, header, tables = newer
+        seed, level_num, room_id, cleared, state, score, _ = header
+        if seed != self.seed:
+            # A new world, whose serials start over
+            self.seed = seed
+            for objects in self.objects:
+                objects.clear()
+            rng = random.Random(seed)
+            self.stars = [(rng.randint(0, game.SCREEN_WIDTH), rng.randint(0, game.SCREEN_HEIGHT))
+                          for _ in range(100)]
+        self.level = load_level(seed, level_num)
+        self.current_room = load_room(seed, level_num, room_id)
+        self.current_room.cleared = bool(cleared)
+        self.game_state = GAME_STATES[state]
+        self.score = score
+        self.ticks = tick
+
+        players, enemies, bullets, coins, powerups = self.objects
+        before = older[2]
+        self.players = self.update_table(players, tables[0], before[0], new_player)
+        self.enemies = self.update_table(enemies, tables[1], before[1], new_enemy)
+        self.bullets = self.update_table(bullets, tables[2], before[2], new_bullet)
+        self.coins = self.update_table(coins, tables[3], before[3], new_point(game.Coin))
+        self.powerups = self.update_table(powerups, tables[4], before[4], new_powerup)
+        self.player = players.get(client_id)
+        for grid, entities in ((self.enemy_grid, self.enemies), (self.coin_grid, self.coins),
+                               (self.powerup_grid, self.powerups)):
+            grid.clear()
+            for entity in entities:
+                grid.insert(entity, *entity.bounds())
+        if newer[0] == older[0]:
+            return 1
+        return (render_tick - older[0]) / (newer[0] - older[0])
+
+    # Bring the entities of one table up to rows, creating the ones that
+    # appeared and forgetting the ones that left; returns them as a list
+    def update_table(self, objects, rows, before, create):
+        for serial in [serial for serial in objects if serial not in rows]:
+            del objects[serial]
+        for serial, row in rows.items():
+            entity = objects.get(serial)
+            if entity is None:
+                entity = objects[serial] = create(row)
+            else:
+                refresh(entity, row)
+            if hasattr(entity, 'prev_x'):
+                old = before.get(serial, row)
+                entity.prev_x = old[0] / POSITION_SCALE
+                entity.prev_y = old[1] / POSITION_SCALE
+        return list(objects.values())
+
+def new_player(row):
+    player = game.Player(0, 0)
+    refresh(player, row)
+    return player
+
+def new_enemy(row):
+    enemy = game.Enemy(0, 0, row[2])
+    refresh(enemy, row)
+    return enemy
+
+def new_bullet(row):
+    bullet = game.Bullet(0, 0, 0, 0)
+    refresh(bullet, row)
+    return bullet
+
+def new_point(cls):
+    def create(row):
+        entity = cls(0, 0)
+        refresh(entity, row)
+        return entity
+    return create
+
+def new_powerup(row):
+    powerup = game.PowerUp(0, 0, row[2])
+    refresh(powerup, row)
+    return powerup
+
+def refresh(entity, row):
+    entity.x = row[0] / POSITION_SCALE
+    entity.y = row[1] / POSITION_SCALE
+    if isinstance(entity, game.Player):
+        entity.health, entity.weapon, entity.speed = row[2:]
+    elif isinstance(entity, game.Enemy):
+        entity.health = row[3]
+
+# The protocol side of a client, without sockets: feed it datagrams with
+# receive() and send what input_packet() returns. Events wait in `events`
+# until the server acknowledges them in a snapshot header. Snapshots are
+# drawn INTERP_DELAY intervals behind a clock that runs at the server's tick
+# rate and eases towards the newest snapshot, so there is nearly always one
+# on either side of the tick being drawn.
+class Client:
+    def __init__(self):
+        self.id = None
+        self.tick_rate = game.TICK_RATE
+        self.interval = 1
+        self.closed = False
+        self.history = {}  # tick -> (header, tables)
+        self.frames = []  # newest snapshots as (tick, header, tables), oldest first
+        self.latest = 0
+        self.clock = None  # server tick being drawn, before the delay
+        self.seq = 0
+        self.events = []  # codes not yet acknowledged
+        self.first_event = 0  # number of the first of events
+        self.snapshots = 0
+        self.stale = 0  # snapshots dropped because their base was lost
+        self.world = ClientWorld()
+
+    def receive(self, data):
+        kind = data[0]
+        if kind == netcode.WELCOME:
+            if self.id is None:
+                self.id, self.tick_rate, self.interval = netcode.decode_welcome(data)
+        elif kind == netcode.SNAPSHOT:
+            self.snapshot(data)
+        elif kind == netcode.BYE:
+            self.closed = True
+
+    def snapshot(self, data):
+        decoded = netcode.decode_snapshot(data, self.history)
+        if decoded is None:
+            self.stale += 1
+            return
+        tick, header, tables = decoded
+        self.snapshots += 1
+        if self.frames and header[0] != self.frames[-1][1][0]:
+            # The server started a new world, with its ticks from 0 again
+            self.history.clear()
+            self.frames = []
+            self.latest = 0
+            self.clock = None
+        self.history[tick] = (header, tables)
+        if len(self.history) > HISTORY:
+            del self.history[min(self.history)]
+        if tick <= self.latest:
+            return  # arrived out of order; kept as a base only
+        self.latest = tick
+        self.frames.append(decoded)
+        del self.frames[:-FRAMES]
+        acked = header[6] - self.first_event
+        if acked > 0:
+            del self.events[:acked]
+            self.first_event = header[6]
+        if self.clock is None:
+            self.clock = tick
+
+    def input_packet(self, inputs):
+        self.events.extend(NET_EVENTS.index(event) for event in inputs.events if event in NET_EVENTS)
+        self.seq += 1
+        return netcode.encode_input(self.seq, self.latest, inputs, self.first_event, self.events)
+
+    # Move the clock on by ms and return the tick to draw
+    def advance(self, ms):
+        self.clock += ms * self.tick_rate / 1000
+        lead = self.latest - self.clock
+        if abs(lead) > 4 * self.interval:
+            self.clock = self.latest
+        else:
+            self.clock += lead * 0.1
+        return self.clock - INTERP_DELAY * self.interval
+
+    # Place the world's entities for drawing at render_tick; returns alpha
+    def show(self, render_tick):
+        return self.world.show(self.frames, render_tick, self.id)
+
+# A load-test client: plays with game.autopilot on its own view of the
+# world, answering every snapshot with input
+class Bot(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.client = Client()
+        self.transport = None
+        self.snapshots = 0
+        self.stale = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.hello()
+
+    def hello(self):
+        if self.client.id is None and not self.transport.is_closing():
+            self.transport.sendto(netcode.encode_hello())
+            asyncio.get_running_loop().call_later(HELLO_RETRY, self.hello)
+
+    def datagram_received(self, data, addr):
+        client = self.client
+        latest = client.latest
+        client.receive(data)
+        self.snapshots = client.snapshots
+        self.stale = client.stale
+        if client.latest == latest:
+            return
+        world = client.world
+        client.show(client.latest)
+        if world.player is None or world.player.health <= 0:
+            inputs = game.Inputs()
+        else:
+            inputs = game.autopilot(world)
+        self.transport.sendto(client.input_packet(inputs))
+
+    def leave(self):
+        if not self.transport.is_closing():
+            self.transport.sendto(netcode.encode_bye())
+
+# Play on a server at host:port in a window
+def run_client(host, port, dirty_rects=True):
+    pygame.display.init()
+    screen = pygame.display.set_mode((game.SCREEN_WIDTH, game.SCREEN_HEIGHT))
+    pygame.display.set_caption(f"Soul Knight Clone - {host}:{port}")
+    clock = pygame.time.Clock()
+    high_score = game.HighScore()
+    renderer = game.Renderer(screen, dirty_rects)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    sock.connect((host, port))
+
+    def send(data):
+        try:
+            sock.send(data)
+        except ConnectionRefusedError:
+            pass  # nobody listening yet; hellos retry until the timeout
+
+    client = Client()
+    world = client.world
+    # F3 turns the profiler on together with the overlay, as in the game
+    profiler = world.profiler
+    phase = profiler.phase
+    started = time.monotonic()
+    last_hello = None
+    running = True
+    while running and not client.closed:
+        profiler.begin_frame()
+        with phase('wait'):
+            ms = clock.tick(game.FPS)
+        with phase('input'):
+            inputs, quit_requested = game.poll_inputs()
+            inputs.mouse_x, inputs.mouse_y = renderer.camera.to_world(inputs.mouse_x, inputs.mouse_y)
+        if quit_requested:
+            running = False
+        if game.EVENT_TOGGLE_PROFILER in inputs.events:
+            renderer.overlay = not renderer.overlay
+            profiler.enabled = renderer.overlay
+        now = time.monotonic()
+        if client.id is None:
+            if now - started > CONNECT_TIMEOUT:
+                print(f"No answer from {host}:{port}", file=sys.stderr)
+                break
+            if last_hello is None or now - last_hello > HELLO_RETRY:
+                send(netcode.encode_hello())
+                last_hello = now
+        with phase('network'):
+            while True:
+                try:
+                    data = sock.recv(65536)
+                except BlockingIOError:
+                    break
+                except ConnectionRefusedError:
+                    continue
+                client.receive(data)
+            joined = client.id is not None and client.frames
+            if joined:
+                send(client.input_packet(inputs))
+        if joined:
+            with phase('show'):
+                alpha = client.show(client.advance(ms))
+            if world.player is not None:
+                with phase('draw'):
+                    renderer.draw(world, high_score.get(), alpha)
+                with phase('present'):
+                    renderer.present()
+        profiler.end_frame({'enemies': len(world.enemies), 'bullets': len(world.bullets),
+                            'coins': len(world.coins)} if profiler.enabled else None)
+    if client.closed:
+        print(f"Server at {host}:{port} closed the connection or is full", file=sys.stderr)
+    elif client.id is not None:
+        send(netcode.encode_bye())
+    sock.close()
+    pygame.quit()
+    return 0 if not client.closed else 1
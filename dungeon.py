@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# dungeon.py - Seeded room graphs, background room prefetch and room snapshots
+
+import random
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# A random tree of rooms: each new room hangs off a random earlier room that
+# still has a free door, so the graph branches everywhere and stays shallow
+# (depth grows with the log of the room count). Room 0 is the start; the
+# boss waits in the deepest room.
+class DungeonGraph:
+    def __init__(self, rooms, rng, max_children=3):
+        self.parent = [-1] * rooms
+        self.children = [[] for _ in range(rooms)]
+        self.depth = [0] * rooms
+        open_rooms = [0]
+        for room in range(1, rooms):
+            i = rng.randrange(len(open_rooms))
+            parent = open_rooms[i]
+            self.parent[room] = parent
+            self.children[parent].append(room)
+            self.depth[room] = self.depth[parent] + 1
+            # The start room has no door back, so it can take one more child
+            if len(self.children[parent]) >= max_children + (parent == 0):
+                open_rooms[i] = open_rooms[-1]
+                open_rooms.pop()
+            open_rooms.append(room)
+        self.boss = max(range(rooms), key=self.depth.__getitem__)
+
+    def __len__(self):
+        return len(self.parent)
+
+    # Rooms with a door from room: its parent first, then its children
+    def neighbors(self, room):
+        parent = self.parent[room]
+        return ([parent] if parent >= 0 else []) + self.children[room]
+
+    # The neighbor of room on the way to goal
+    def step_towards(self, room, goal):
+        if room == goal:
+            return None
+        node = goal
+        while node >= 0:
+            if self.parent[node] == room:
+                return node
+            node = self.parent[node]
+        return self.parent[room]
+
+def build_graph(seed, rooms):
+    return DungeonGraph(rooms, random.Random(f"{seed}:graph"))
+
+# Seed for one room's generator, independent of the order rooms are built in
+# or the thread building them
+def room_rng(seed, room_id):
+    return random.Random(f"{seed}:{room_id}")
+
+# Builds rooms on a worker thread ahead of time. Keys are whatever the caller
+# uses to identify a build; take() hands back a finished build, waits for one
+# already under way, or builds inline if it was never requested. Builds must
+# be pure functions of their arguments, so it makes no difference to the
+# result which of the three happened.
+class Prefetcher:
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.executor = None  # started on first request
+        self.pending = {}
+        self.hits = 0  # finished before they were needed
+        self.waits = 0  # still running when needed
+        self.misses = 0  # never requested
+
+    def request(self, key, build, *args):
+        if key in self.pending:
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prefetch')
+        self.pending[key] = self.executor.submit(build, *args)
+
+    def take(self, key, build, *args):
+        future = self.pending.pop(key, None)
+        if future is None:
+            self.misses += 1
+            return build(*args)
+        if future.done():
+            self.hits += 1
+        else:
+            self.waits += 1
+        return future.result()
+
+    # Drop requests whose keys fail keep(key); builds already running finish
+    # and are discarded
+    def discard(self, keep=lambda key: False):
+        for key in [key for key in self.pending if not keep(key)]:
+            self.pending.pop(key).cancel()
+
+    # Drop queued builds and stop the worker thread; with wait, also let a
+    # build already running finish first, so it costs nothing afterwards
+    def shutdown(self, wait=False):
+        self.discard()
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
+
+    def stats(self):
+        return {'hits': self.hits, 'waits': self.waits, 'misses': self.misses, 'pending': len(self.pending)}
+
+# Snapshot rows of (x, y, type, health) as 11 bytes each
+_ENTITY = struct.Struct('<ffBh')
+
+def pack_entities(rows):
+    return b''.join(_ENTITY.pack(*row) for row in rows)
+
+def unpack_entities(data):
+    return list(_ENTITY.iter_unpack(data))
+
+# Graph construction and routing cost at several dungeon sizes
+def benchmark(sizes=(100, 1000, 10000), seed=1):
+    print(f"{'rooms':>8} {'build ms':>9} {'depth':>6} {'route us':>9}")
+    for rooms in sizes:
+        start = time.perf_counter()
+        graph = DungeonGraph(rooms, random.Random(seed))
+        build_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        room = 0
+        steps = 0
+        while room != graph.boss:
+            room = graph.step_towards(room, graph.boss)
+            steps += 1
+        route_us = (time.perf_counter() - start) * 1e6 / max(steps, 1)
+        print(f"{rooms:>8} {build_ms:>9.3f} {graph.depth[graph.boss]:>6} {route_us:>9.2f}")
+        if steps != graph.depth[graph.boss]:
+            print("route to boss is not the shortest path", file=sys.stderr)
+
+if __name__ == "__main__":
+    benchmark()
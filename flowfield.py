@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# flowfield.py - Tile obstacle grids and shared flow-field pathfinding
+
+import heapq
+import math
+import random
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+UNREACHED = np.iinfo(np.int32).max
+# Neighbor (dx, dy) offsets, orthogonal first so ties prefer straight moves
+OFFSETS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+# Walls on a grid of square tiles; walls[ty, tx] is True for a blocked tile.
+# Anything outside the grid counts as blocked.
+class TileGrid:
+    def __init__(self, cols, rows, tile_size):
+        self.cols = cols
+        self.rows = rows
+        self.tile_size = tile_size
+        self.walls = np.zeros((rows, cols), dtype=bool)
+        self.counts = None  # summed-area table of walls, rebuilt after changes
+
+    def add_block(self, tx, ty, w, h):
+        self.walls[max(0, ty):ty + h, max(0, tx):tx + w] = True
+        self.counts = None
+
+    # counts[ty, tx] is the number of walls above and left of tile (tx, ty),
+    # so any box of tiles is checked with four lookups
+    def wall_counts(self):
+        if self.counts is None:
+            counts = np.zeros((self.rows + 1, self.cols + 1), dtype=np.int32)
+            counts[1:, 1:] = self.walls.cumsum(axis=0).cumsum(axis=1)
+            self.counts = counts
+        return self.counts
+
+    def has_walls(self):
+        return bool(self.walls.any())
+
+    def tile_of(self, x, y):
+        return int(x // self.tile_size), int(y // self.tile_size)
+
+    def blocked(self, x, y):
+        tx, ty = self.tile_of(x, y)
+        return not (0 <= tx < self.cols and 0 <= ty < self.rows) or bool(self.walls[ty, tx])
+
+    # Vectorized blocked() over arrays of points
+    def blocked_many(self, xs, ys):
+        tx = np.floor_divide(xs, self.tile_size).astype(np.int64)
+        ty = np.floor_divide(ys, self.tile_size).astype(np.int64)
+        inside = (tx >= 0) & (tx < self.cols) & (ty >= 0) & (ty < self.rows)
+        hit = ~inside
+        hit[inside] = self.walls[ty[inside], tx[inside]]
+        return hit
+
+    # Whether a w x h box at (x, y) overlaps a wall or leaves the grid
+    def box_blocked(self, x, y, w, h):
+        size = self.tile_size
+        tx0 = int(x // size)
+        ty0 = int(y // size)
+        tx1 = int((x + w - 1e-6) // size)
+        ty1 = int((y + h - 1e-6) // size)
+        if tx0 < 0 or ty0 < 0 or tx1 >= self.cols or ty1 >= self.rows:
+            return True
+        counts = self.wall_counts()
+        return bool(counts[ty1 + 1, tx1 + 1] - counts[ty0, tx1 + 1] - counts[ty1 + 1, tx0] + counts[ty0, tx0])
+
+    # Vectorized box_blocked() over arrays of boxes
+    def boxes_blocked(self, xs, ys, ws, hs):
+        size = self.tile_size
+        tx0 = np.floor_divide(xs, size).astype(np.int64)
+        ty0 = np.floor_divide(ys, size).astype(np.int64)
+        tx1 = np.floor_divide(xs + ws - 1e-6, size).astype(np.int64)
+        ty1 = np.floor_divide(ys + hs - 1e-6, size).astype(np.int64)
+        outside = (tx0 < 0) | (ty0 < 0) | (tx1 >= self.cols) | (ty1 >= self.rows)
+        counts = self.wall_counts()
+        # Boxes off the grid are blocked anyway; point them at a valid cell
+        tx0[outside] = ty0[outside] = 0
+        tx1[outside] = ty1[outside] = 0
+        tx1 += 1
+        ty1 += 1
+        return outside | ((counts[ty1, tx1] - counts[ty0, tx1] - counts[ty1, tx0] + counts[ty0, tx0]) > 0)
+
+    # Fraction (0..1) of the way from (x0, y0) to (x1, y1) at which the
+    # segment first enters a wall or leaves the grid, or None if it never
+    # does. Walks only the tiles the segment crosses (Amanatides & Woo), so
+    # the cost follows the number of tiles crossed, not the segment's length.
+    def raycast(self, x0, y0, x1, y1):
+        size = self.tile_size
+        tx = int(x0 // size)
+        ty = int(y0 // size)
+        cols = self.cols
+        rows = self.rows
+        walls = self.walls
+        if not (0 <= tx < cols and 0 <= ty < rows) or walls[ty, tx]:
+            return 0.0
+        dx = x1 - x0
+        dy = y1 - y0
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        # t at the next vertical and horizontal tile edge, and per tile after
+        if dx:
+            next_x = ((tx + (dx > 0)) * size - x0) / dx
+            delta_x = size / abs(dx)
+        else:
+            next_x = delta_x = math.inf
+        if dy:
+            next_y = ((ty + (dy > 0)) * size - y0) / dy
+            delta_y = size / abs(dy)
+        else:
+            next_y = delta_y = math.inf
+        while True:
+            if next_x < next_y:
+                t = next_x
+                tx += step_x
+                next_x += delta_x
+            else:
+                t = next_y
+                ty += step_y
+                next_y += delta_y
+            if t > 1:
+                return None
+            if not (0 <= tx < cols and 0 <= ty < rows) or walls[ty, tx]:
+                return t
+
+    # Pixel rects (x, y, w, h) covering the walls, one per horizontal run,
+    # optionally only within the tiles [tx0, tx1) x [ty0, ty1)
+    def rects(self, tx0=0, ty0=0, tx1=None, ty1=None):
+        size = self.tile_size
+        tx0 = max(0, tx0)
+        tx1 = self.cols if tx1 is None else min(self.cols, tx1)
+        for ty in range(max(0, ty0), self.rows if ty1 is None else min(self.rows, ty1)):
+            row = self.walls[ty]
+            tx = tx0
+            while tx < tx1:
+                if row[tx]:
+                    start = tx
+                    while tx < tx1 and row[tx]:
+                        tx += 1
+                    yield (start * size, ty * size, (tx - start) * size, size)
+                else:
+                    tx += 1
+
+# Distances from the target tiles to every tile, spread by a breadth-first
+# search, and for each tile the neighbor one step closer to the nearest
+# target. The search runs a bounded number of tiles per update; until it
+# finishes, headings() keeps answering from the last complete field, so the
+# work per frame stays capped however many agents read it. A target that
+# moves mid-search does not restart it: the search completes on the tiles it
+# started from, and the next one starts from wherever the target is by then.
+# A restart on every move would never finish in a room that takes more
+# updates to search than the player spends crossing a tile.
+class FlowField:
+    def __init__(self, grid):
+        self.grid = grid
+        self.target = None  # tiles the current field leads to
+        self.dist = None
+        # Pixel center of each tile's next tile, NaN where there is none
+        self.next_x = np.full((grid.rows, grid.cols), np.nan)
+        self.next_y = np.full((grid.rows, grid.cols), np.nan)
+        self.pending = None  # tiles being searched from
+        self.wanted = None  # latest tiles asked for, searched once pending is done
+        self.pending_dist = None  # flat list, indexed ty * cols + tx
+        self.frontier = None
+        self.open = None  # flat list of walkable tiles, built on first search
+        self.searches = 0
+
+    # Retarget on the tile under (x, y) and spend up to budget tiles of search
+    def update(self, x, y, budget):
+        self.update_many(((x, y),), budget)
+
+    # Retarget on the tiles under several points, leading every tile to the
+    # nearest of them; targets in walls or off the grid are ignored
+    def update_many(self, points, budget):
+        grid = self.grid
+        tiles = []
+        for x, y in points:
+            tx, ty = grid.tile_of(x, y)
+            if 0 <= tx < grid.cols and 0 <= ty < grid.rows and not grid.walls[ty, tx]:
+                tiles.append((tx, ty))
+        if tiles:
+            self.wanted = tuple(sorted(set(tiles)))
+        while budget > 0:
+            if self.pending is None:
+                if self.wanted is None or self.wanted == self.target:
+                    break
+                self.start(self.wanted)
+            budget = self.advance(budget)
+
+    def start(self, tiles):
+        grid = self.grid
+        if self.open is None:
+            self.open = (~grid.walls).ravel().tolist()
+        starts = [ty * grid.cols + tx for tx, ty in tiles]
+        self.pending = tiles
+        self.pending_dist = [UNREACHED] * (grid.rows * grid.cols)
+        for start in starts:
+            self.pending_dist[start] = 0
+        self.frontier = deque(starts)
+
+    # Search up to budget tiles and return what is left of it. Plain lists
+    # rather than NumPy here: the search touches one tile at a time, where
+    # element access on arrays is several times slower.
+    def advance(self, budget):
+        dist = self.pending_dist
+        walkable = self.open
+        cols = self.grid.cols
+        size = len(dist)
+        frontier = self.frontier
+        while frontier and budget > 0:
+            index = frontier.popleft()
+            budget -= 1
+            d = dist[index] + 1
+            tx = index % cols
+            if tx > 0 and walkable[index - 1] and dist[index - 1] == UNREACHED:
+                dist[index - 1] = d
+                frontier.append(index - 1)
+            if tx < cols - 1 and walkable[index + 1] and dist[index + 1] == UNREACHED:
+                dist[index + 1] = d
+                frontier.append(index + 1)
+            if index >= cols and walkable[index - cols] and dist[index - cols] == UNREACHED:
+                dist[index - cols] = d
+                frontier.append(index - cols)
+            if index + cols < size and walkable[index + cols] and dist[index + cols] == UNREACHED:
+                dist[index + cols] = d
+                frontier.append(index + cols)
+        if not frontier:
+            self.finish()
+        return budget
+
+    # Link every tile to its lowest-distance neighbor. Diagonals need both
+    # orthogonal tiles open, so agents never cut a wall corner.
+    def finish(self):
+        grid = self.grid
+        rows = grid.rows
+        cols = grid.cols
+        dist = np.array(self.pending_dist, dtype=np.int32).reshape(rows, cols)
+        padded = np.full((rows + 2, cols + 2), UNREACHED, dtype=np.int32)
+        padded[1:-1, 1:-1] = dist
+        best = dist.copy()
+        step_x = np.full((rows, cols), np.nan)
+        step_y = np.full((rows, cols), np.nan)
+        for dx, dy in OFFSETS:
+            neighbor = padded[1 + dy:rows + 1 + dy, 1 + dx:cols + 1 + dx]
+            better = neighbor < best
+            if dx and dy:
+                better &= (padded[1:-1, 1 + dx:cols + 1 + dx] != UNREACHED)
+                better &= (padded[1 + dy:rows + 1 + dy, 1:-1] != UNREACHED)
+            best = np.where(better, neighbor, best)
+            step_x = np.where(better, dx, step_x)
+            step_y = np.where(better, dy, step_y)
+        size = grid.tile_size
+        self.dist = dist
+        self.next_x = (np.arange(cols)[None, :] + step_x + 0.5) * size
+        self.next_y = (np.arange(rows)[:, None] + step_y + 0.5) * size
+        self.target = self.pending
+        self.pending = None
+        self.pending_dist = None
+        self.frontier = None
+        self.searches += 1
+
+    # Unit headings from points (agent centers) towards the center of the
+    # next tile on their way, which also pulls an agent straddling two tiles
+    # back into line before a turn. (0, 0) in the target tile, in unreached
+    # tiles, off the grid, or before the first search completes.
+    def headings(self, xs, ys):
+        grid = self.grid
+        tx = np.floor_divide(xs, grid.tile_size).astype(np.int64)
+        ty = np.floor_divide(ys, grid.tile_size).astype(np.int64)
+        inside = (tx >= 0) & (tx < grid.cols) & (ty >= 0) & (ty < grid.rows)
+        out = np.zeros((len(tx), 2))
+        next_x = self.next_x[ty[inside], tx[inside]]
+        next_y = self.next_y[ty[inside], tx[inside]]
+        dx = next_x - xs[inside]
+        dy = next_y - ys[inside]
+        length = np.sqrt(dx ** 2 + dy ** 2)
+        usable = length > 0  # False for NaN too
+        rows = np.flatnonzero(inside)[usable]
+        out[rows, 0] = dx[usable] / length[usable]
+        out[rows, 1] = dy[usable] / length[usable]
+        return out
+
+# Per-agent A* over the same grid and moves as the flow field, for comparison
+def astar(walls, start, goal):
+    rows, cols = walls.shape
+    open_heap = [(0, 0, start)]
+    cost = {start: 0}
+    came_from = {}
+    while open_heap:
+        _, g, tile = heapq.heappop(open_heap)
+        if tile == goal:
+            path = [tile]
+            while tile in came_from:
+                tile = came_from[tile]
+                path.append(tile)
+            return path[::-1]
+        if g > cost[tile]:
+            continue
+        tx, ty = tile
+        for dx, dy in OFFSETS[:4]:
+            nx = tx + dx
+            ny = ty + dy
+            if 0 <= nx < cols and 0 <= ny < rows and not walls[ny, nx]:
+                step = g + 1
+                if step < cost.get((nx, ny), UNREACHED):
+                    cost[(nx, ny)] = step
+                    came_from[(nx, ny)] = tile
+                    heapq.heappush(open_heap, (step + abs(goal[0] - nx) + abs(goal[1] - ny), step, (nx, ny)))
+    return None
+
+# A room-sized grid with random pillars; per target change, time one full
+# flow field plus sampling it for every agent against one A* per agent
+def benchmark(counts=(10, 100, 1000, 2000), cols=40, rows=30, tile_size=20, seed=1):
+    rng = random.Random(seed)
+    grid = TileGrid(cols, rows, tile_size)
+    for _ in range(40):
+        grid.add_block(rng.randrange(cols), rng.randrange(rows), rng.randint(1, 3), rng.randint(1, 5))
+    open_tiles = [(tx, ty) for ty in range(rows) for tx in range(cols) if not grid.walls[ty, tx]]
+    goal = open_tiles[len(open_tiles) // 2]
+    print(f"{'agents':>8} {'flow ms':>9} {'A* ms':>9}")
+    for n in counts:
+        starts = [rng.choice(open_tiles) for _ in range(n)]
+        xs = np.array([tx * tile_size + tile_size / 2 for tx, _ in starts])
+        ys = np.array([ty * tile_size + tile_size / 2 for _, ty in starts])
+        begin = time.perf_counter()
+        field = FlowField(grid)
+        field.update(goal[0] * tile_size, goal[1] * tile_size, cols * rows)
+        field.headings(xs, ys)
+        flow_ms = (time.perf_counter() - begin) * 1000
+        begin = time.perf_counter()
+        for start in starts:
+            astar(grid.walls, start, goal)
+        astar_ms = (time.perf_counter() - begin) * 1000
+        print(f"{n:>8} {flow_ms:>9.3f} {astar_ms:>9.3f}")
+        if flow_ms > astar_ms and n >= 100:
+            print(f"flow field slower than A* at {n} agents", file=sys.stderr)
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,24 +1,54 @@
 #!/usr/bin/env python3
 # game.py - Simple Soul Knight-like game using Pygame
 
+import time
+STARTED = time.perf_counter()  # for the time-to-first-frame report
+
 import pygame
 import sys
 import math
 import random
 import os
+import argparse
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from audio import Audio
+from camera import Camera, ChunkCache
+from collision import sweep_segments
+from dungeon import Prefetcher, build_graph, pack_entities, room_rng, unpack_entities
+from flowfield import FlowField, TileGrid
+from hud import Hud, TextCache
+from particles import ParticleSystem
+from pool import LiveList, Pool
+from profiler import Profiler
+from replay import Recorder, diff_states, load_replay
+from spatial import SpatialHash
+from sprites import SpriteCache
+from steering import steer
 
 # Constants
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 FPS = 60
+TICK_RATE = 60  # simulation ticks per second, independent of FPS
+MOTION_UNIT_MS = 1000 / 60  # speeds are in pixels per this many ms
+MAX_CATCH_UP_TICKS = 5  # most ticks simulated before a frame is drawn
+MAX_FRAME_SKIP = 3  # most frames skipped in a row while the simulation catches up
 PLAYER_SPEED = 5
 BULLET_SPEED = 10
+SNIPER_SPEED = 40  # faster than any enemy is wide; bullets are swept, so nothing tunnels
+SNIPER_PIERCE = 2  # enemies a sniper round passes through before stopping
 ENEMY_SPEED = 2
 PLAYER_SIZE = 20
 ENEMY_SIZE = 15
 BULLET_SIZE = 5
 COIN_SIZE = 8
 POWERUP_SIZE = 10
+TILE_SIZE = 20
 
 # Colors
 BLACK = (0, 0, 0)
@@ -30,46 +60,118 @@ YELLOW = (255, 255, 0)
 DARK_BLUE = (20, 20, 50)
 PURPLE = (128, 0, 128)
 ORANGE = (255, 165, 0)
+WALL_COLOR = (70, 70, 100)
+
+LEVEL_COMPLETE_DELAY = 2000  # ms
+POWERUP_SPAWN_RATE = 10000  # ms
+MACHINE_GUN_RATE = 100  # ms
+SLASH_RANGE = 50
+SLASH_DAMAGE = 50
+WEAPON_NAMES = ['Pistol', 'Shotgun', 'Machine Gun', 'Sniper']
+ROOM_PILLARS = 6  # wall blocks tried per enemy room
+ROOM_ENEMIES = 5
+DUNGEON_ROOMS = 200  # rooms per level
+LIVE_ROOMS = 8  # most recently entered rooms kept built; older ones are snapshotted
+# Room sizes in screens (wide, high) and how often each is rolled; enemies
+# and pillars scale with the area
+ROOM_SCREENS = [(1, 1), (2, 1), (1, 2), (2, 2), (3, 2), (4, 3)]
+ROOM_SCREEN_WEIGHTS = [4, 3, 3, 2, 1, 1]
+BOSS_ROOM_SCREENS = (2, 2)
+FLOWFIELD_BUDGET = 400  # tiles of path search per tick
+ENEMY_SEPARATION = 1.0  # weight of the push apart from crowding enemies; 0 disables it
+DIRTY_FULL_FRAME_RATIO = 0.5  # above this share of the screen, flip the whole frame
+CHUNK_TILES = 16  # static layer chunk edge in tiles
+CHUNK_CACHE = 48  # static layer chunks kept rendered
+CULL_MARGIN = 16  # px beyond the view still drawn, for health bars and interpolation
+PROFILER_OVERLAY_REFRESH = 15  # frames between overlay text updates
+# Where extra players stand on entering a room, around the first at the centre
+PLAYER_SPAWN_OFFSETS = [(0, 0), (30, 0), (-30, 0), (0, 30), (0, -30), (30, 30), (-30, -30), (30, -30), (-30, 30)]
+HIGH_SCORE_FILE = 'high_score.txt'
+MUSIC_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '2.mp3')
 
-# Initialize Pygame
-pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Soul Knight Clone")
-clock = pygame.time.Clock()
+# Input events fed to World.step
+EVENT_SWITCH_WEAPON = 'switch_weapon'
+EVENT_PAUSE = 'pause'
+EVENT_SLASH = 'slash'
+EVENT_SHOOT = 'shoot'
+EVENT_TOGGLE_PROFILER = 'toggle_profiler'  # handled by the main loop, not the World
 
-# Classes
+# Position drawn between the previous tick (t = 0) and the current one (t = 1)
+def lerp(previous, current, t):
+    if t >= 1:
+        return current
+    return previous + (current - previous) * t
+
+# Classes. Moving entities keep their position from before the last tick in
+# prev_x/prev_y so the renderer can interpolate between ticks. Pooled ones get
+# a serial from their pool on every acquire, naming them over the network.
 class Player:
+    __slots__ = ('x', 'y', 'prev_x', 'prev_y', 'health', 'max_health', 'speed', 'weapon', 'sword_cooldown',
+                 'last_sword_time', 'last_machine_gun_time')
+
     def __init__(self, x, y):
-        self.x = x
-        self.y = y
+        self.x = self.prev_x = x
+        self.y = self.prev_y = y
         self.health = 100
         self.max_health = 100
         self.speed = PLAYER_SPEED
         self.weapon = 0  # 0: pistol, 1: shotgun, 2: machine gun, 3: sniper
         self.sword_cooldown = 2000  # ms
         self.last_sword_time = 0
+        self.last_machine_gun_time = 0
 
-    def move(self, keys):
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            self.x -= self.speed
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            self.x += self.speed
-        if keys[pygame.K_UP] or keys[pygame.K_w]:
-            self.y -= self.speed
-        if keys[pygame.K_DOWN] or keys[pygame.K_s]:
-            self.y += self.speed
+    # scale is the tick length in MOTION_UNIT_MS; with a tile grid, each axis
+    # of the move is dropped if it would end inside a wall. width and height
+    # are the room's.
+    def move(self, inputs, scale=1, tiles=None, width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+        self.prev_x = self.x
+        self.prev_y = self.y
+        step = self.speed * scale
+        x = self.x
+        y = self.y
+        if inputs.left:
+            x -= step
+        if inputs.right:
+            x += step
+        if inputs.up:
+            y -= step
+        if inputs.down:
+            y += step
 
         # Keep in bounds
-        self.x = max(0, min(SCREEN_WIDTH - PLAYER_SIZE, self.x))
-        self.y = max(0, min(SCREEN_HEIGHT - PLAYER_SIZE, self.y))
+        x = max(0, min(width - PLAYER_SIZE, x))
+        y = max(0, min(height - PLAYER_SIZE, y))
+        if tiles is not None:
+            if tiles.box_blocked(x, self.y, PLAYER_SIZE, PLAYER_SIZE):
+                x = self.x
+            if tiles.box_blocked(x, y, PLAYER_SIZE, PLAYER_SIZE):
+                y = self.y
+        self.x = x
+        self.y = y
+
+    def bounds(self):
+        return (self.x, self.y, PLAYER_SIZE, PLAYER_SIZE)
+
+    def center(self):
+        return (self.x + PLAYER_SIZE//2, self.y + PLAYER_SIZE//2)
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, BLUE, (int(self.x + PLAYER_SIZE//2), int(self.y + PLAYER_SIZE//2)), PLAYER_SIZE//2)
+    def sprite(self, sprites, alpha=1):
+        radius = PLAYER_SIZE//2
+        x = lerp(self.prev_x, self.x, alpha)
+        y = lerp(self.prev_y, self.y, alpha)
+        return sprites.circle(radius, BLUE), (int(x + radius) - radius, int(y + radius) - radius)
 
 class Enemy:
+    __slots__ = ('x', 'y', 'prev_x', 'prev_y', 'type', 'speed', 'color', 'size', 'health', 'max_health', 'alive',
+                 'serial')
+
     def __init__(self, x, y, enemy_type=0):
-        self.x = x
-        self.y = y
+        self.reset(x, y, enemy_type)
+
+    def reset(self, x, y, enemy_type=0):
+        self.alive = True
+        self.x = self.prev_x = x
+        self.y = self.prev_y = y
         self.type = enemy_type
         if self.type == 0:  # normal
             self.speed = ENEMY_SPEED
@@ -98,390 +200,1127 @@ class Enemy:
             self.health = 10
         self.max_health = self.health
 
-    def move_towards(self, target_x, target_y):
-        dx = target_x - self.x
-        dy = target_y - self.y
-        dist = math.sqrt(dx**2 + dy**2)
-        if dist > 0:
-            self.x += (dx / dist) * self.speed
-            self.y += (dy / dist) * self.speed
-
-    def draw(self, screen):
-        pygame.draw.circle(screen, self.color, (int(self.x + self.size//2), int(self.y + self.size//2)), self.size//2)
-        # Health bar
-        bar_width = self.size
-        bar_height = 5
-        bar_x = self.x
-        bar_y = self.y - 10
-        pygame.draw.rect(screen, RED, (bar_x, bar_y, bar_width, bar_height))
-        pygame.draw.rect(screen, GREEN, (bar_x, bar_y, bar_width * (self.health / self.max_health), bar_height))
+    def bounds(self):
+        return (self.x, self.y, self.size, self.size)
+
+    def sprite(self, sprites, alpha=1):
+        radius = self.size//2
+        x = lerp(self.prev_x, self.x, alpha)
+        y = lerp(self.prev_y, self.y, alpha)
+        return sprites.circle(radius, self.color), (int(x + radius) - radius, int(y + radius) - radius)
 
+    # Health bar, only shown once the enemy has taken damage
+    def health_bar(self, sprites, alpha=1):
+        if self.health >= self.max_health:
+            return None
+        filled = int(self.size * max(0, self.health) / self.max_health)
+        x = lerp(self.prev_x, self.x, alpha)
+        y = lerp(self.prev_y, self.y, alpha)
+        return sprites.health_bar(self.size, filled), (int(x), int(y - 10))
+
+# pierce is how many enemies the bullet passes through before it stops;
+# hits holds the serials of the ones it already passed, so they are not hit
+# again. Serials rather than the enemies themselves: a killed enemy goes back
+# to its pool, and the same object may come back as a new enemy while the
+# bullet is still flying.
 class Bullet:
-    def __init__(self, x, y, target_x, target_y, damage=10):
-        self.x = x
-        self.y = y
+    __slots__ = ('x', 'y', 'prev_x', 'prev_y', 'damage', 'dx', 'dy', 'pierce', 'hits', 'alive', 'serial')
+
+    def __init__(self, x, y, target_x, target_y, damage=10, speed=BULLET_SPEED, pierce=0):
+        self.reset(x, y, target_x, target_y, damage, speed, pierce)
+
+    def reset(self, x, y, target_x, target_y, damage=10, speed=BULLET_SPEED, pierce=0):
+        self.alive = True
+        self.x = self.prev_x = x
+        self.y = self.prev_y = y
         self.damage = damage
+        self.pierce = pierce
+        self.hits = ()
         dx = target_x - x
         dy = target_y - y
         dist = math.sqrt(dx**2 + dy**2)
         if dist > 0:
-            self.dx = (dx / dist) * BULLET_SPEED
-            self.dy = (dy / dist) * BULLET_SPEED
+            self.dx = (dx / dist) * speed
+            self.dy = (dy / dist) * speed
         else:
             self.dx = 0
             self.dy = 0
 
-    def move(self):
-        self.x += self.dx
-        self.y += self.dy
+    def move(self, scale=1):
+        self.prev_x = self.x
+        self.prev_y = self.y
+        self.x += self.dx * scale
+        self.y += self.dy * scale
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, YELLOW, (int(self.x), int(self.y)), BULLET_SIZE)
+    def bounds(self):
+        return (self.x - BULLET_SIZE, self.y - BULLET_SIZE, BULLET_SIZE * 2, BULLET_SIZE * 2)
+
+    def sprite(self, sprites, alpha=1):
+        x = lerp(self.prev_x, self.x, alpha)
+        y = lerp(self.prev_y, self.y, alpha)
+        return sprites.circle(BULLET_SIZE, YELLOW), (int(x) - BULLET_SIZE, int(y) - BULLET_SIZE)
 
 class Coin:
+    __slots__ = ('x', 'y', 'alive', 'serial')
+
     def __init__(self, x, y):
+        self.reset(x, y)
+
+    def reset(self, x, y):
+        self.alive = True
         self.x = x
         self.y = y
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, YELLOW, (int(self.x), int(self.y)), COIN_SIZE)
+    def bounds(self):
+        return (self.x - COIN_SIZE, self.y - COIN_SIZE, COIN_SIZE * 2, COIN_SIZE * 2)
+
+    def sprite(self, sprites):
+        return sprites.circle(COIN_SIZE, YELLOW), (int(self.x) - COIN_SIZE, int(self.y) - COIN_SIZE)
 
 class PowerUp:
+    __slots__ = ('x', 'y', 'type', 'color', 'alive', 'serial')
+
     def __init__(self, x, y, type_):
+        self.reset(x, y, type_)
+
+    def reset(self, x, y, type_):
+        self.alive = True
         self.x = x
         self.y = y
         self.type = type_  # 0: health, 1: speed
         self.color = GREEN if self.type == 0 else BLUE
 
-    def draw(self, screen):
-        pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), POWERUP_SIZE)
+    def bounds(self):
+        return (self.x - POWERUP_SIZE, self.y - POWERUP_SIZE, POWERUP_SIZE * 2, POWERUP_SIZE * 2)
 
-class Particle:
-    def __init__(self, x, y, dx, dy, color, lifetime):
-        self.x = x
-        self.y = y
-        self.dx = dx
-        self.dy = dy
-        self.color = color
-        self.lifetime = lifetime
-        self.age = 0
-
-    def update(self):
-        self.x += self.dx
-        self.y += self.dy
-        self.age += 1
-
-    def draw(self, screen):
-        if self.age < self.lifetime:
-            alpha = 255 * (1 - self.age / self.lifetime)
-            color = (self.color[0], self.color[1], self.color[2], int(alpha))
-            pygame.draw.circle(screen, color, (int(self.x), int(self.y)), 2)
+    def sprite(self, sprites):
+        return sprites.circle(POWERUP_SIZE, self.color), (int(self.x) - POWERUP_SIZE, int(self.y) - POWERUP_SIZE)
 
 class Room:
-    def __init__(self, room_id, enemies=None, boss=False):
+    def __init__(self, room_id, doors=(), boss=False, enemies=None, enemy_pool=None,
+                 width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
         self.id = room_id
-        self.width = SCREEN_WIDTH
-        self.height = SCREEN_HEIGHT
-        self.enemies = enemies or []
+        self.width = width
+        self.height = height
+        self.enemies = LiveList(enemies or (), enemy_pool)
         self.coins = []
         self.powerups = []
-        self.doors = []  # list of (x, y, target_room_id)
+        self.doors = list(doors)  # list of (x, y, target_room_id)
+        self.spawns = []  # (x, y, enemy_type) still to be placed by populate()
         self.cleared = False
         self.boss = boss
-        if room_id == 0:  # start room
-            self.doors = [(SCREEN_WIDTH//2, SCREEN_HEIGHT - 50, 1)]
-        elif room_id == 1:  # enemy room
-            self.doors = [(SCREEN_WIDTH//2, SCREEN_HEIGHT - 50, 2)]
-        elif room_id == 2:  # boss room
-            self.doors = []  # no doors, level end
+        self.tiles = TileGrid(width // TILE_SIZE, height // TILE_SIZE, TILE_SIZE)
+        self.walled = False  # whether tiles has any walls
+        self.flowfield = None  # built on first use
+
+    # Random wall blocks clear of the centre column and row, which hold the
+    # player's spawn point, the boss and the doors
+    def add_pillars(self, rng, count):
+        tiles = self.tiles
+        column = (tiles.cols // 2 - 4, tiles.cols // 2 + 4)
+        row = (tiles.rows // 2 - 3, tiles.rows // 2 + 3)
+        for _ in range(count):
+            w = rng.randint(1, 3)
+            h = rng.randint(2, 5)
+            tx = rng.randint(1, tiles.cols - w - 1)
+            ty = rng.randint(1, tiles.rows - h - 1)
+            if (tx + w > column[0] and tx < column[1]) or (ty + h > row[0] and ty < row[1]):
+                continue
+            tiles.add_block(tx, ty, w, h)
+        self.walled = tiles.has_walls()
+        self.flowfield = None
 
+    def center(self):
+        return (self.width//2, self.height//2)
+
+    # Door positions at the middle of the bottom, top, left and right edges
+    def door_slots(self):
+        w = self.width
+        h = self.height
+        return [(w//2, h - 50), (w//2, 50), (50, h//2), (w - 50, h//2)]
+
+    # Place the generated enemies, taking them from the room's enemy pool
+    def populate(self):
+        pool = self.enemies.pool
+        for x, y, enemy_type in self.spawns:
+            self.enemies.append(pool.acquire(x, y, enemy_type))
+        self.spawns = []
+
+# Lay out one room from the level seed and the room graph alone, so it gives
+# the same room on the prefetch thread or inline: doors to its graph
+# neighbours, walls, enemy spawn points, and a flow field already searched
+# from where the player enters. Enemies are placed later, on the main thread.
+def generate_room(seed, room_id, graph, enemy_pool=None):
+    rng = room_rng(seed, room_id)
+    boss = room_id == graph.boss
+    if room_id == 0:
+        screens = (1, 1)
+    elif boss:
+        screens = BOSS_ROOM_SCREENS
+    else:
+        screens = rng.choices(ROOM_SCREENS, weights=ROOM_SCREEN_WEIGHTS)[0]
+    area = screens[0] * screens[1]
+    room = Room(room_id, boss=boss, enemy_pool=enemy_pool,
+                width=SCREEN_WIDTH * screens[0], height=SCREEN_HEIGHT * screens[1])
+    slots = room.door_slots()
+    bottom = slots[0]
+    rng.shuffle(slots)
+    if boss:
+        # Come in from the bottom, away from where the boss stands
+        slots.remove(bottom)
+        slots.insert(0, bottom)
+    room.doors = [(x, y, target) for (x, y), target in zip(slots, graph.neighbors(room_id))]
+    if room_id == 0:  # start room
+        return room
+    room.add_pillars(rng, (ROOM_PILLARS // 2 if boss else ROOM_PILLARS) * area)
+    if boss:
+        room.spawns.append((room.width//2, 100, 4))
+    else:
+        while len(room.spawns) < ROOM_ENEMIES * area:
+            x = rng.randint(100, room.width - 100)
+            y = rng.randint(100, room.height - 100)
+            enemy_type = rng.choices([0,1,2,3], weights=[5,3,2,1])[0]
+            # Re-roll spawns that would start inside a wall (ENEMY_SIZE + 5 is the largest non-boss)
+            if not room.tiles.box_blocked(x, y, ENEMY_SIZE + 5, ENEMY_SIZE + 5):
+                room.spawns.append((x, y, enemy_type))
+    if room.walled:
+        room.flowfield = FlowField(room.tiles)
+        cx, cy = room.center()
+        room.flowfield.update(cx + PLAYER_SIZE//2, cy + PLAYER_SIZE//2, room.tiles.cols * room.tiles.rows)
+    return room
+
+# A dungeon of DUNGEON_ROOMS rooms in a seeded graph, built only around the
+# player. Entering a room queues its neighbours on the prefetch thread; the
+# LIVE_ROOMS most recently entered stay built, and older ones shrink to a
+# snapshot of their cleared flag and surviving enemies, rebuilt from the
+# seed if the player comes back.
 class Level:
-    def __init__(self, level_num):
+    def __init__(self, level_num, seed, enemy_pool=None, prefetcher=None, graph=None):
         self.num = level_num
-        self.rooms = []
+        self.seed = seed
+        self.enemy_pool = enemy_pool if enemy_pool is not None else Pool(Enemy)
+        self.prefetcher = prefetcher if prefetcher is not None else Prefetcher()
+        self.graph = graph if graph is not None else build_graph(seed, DUNGEON_ROOMS)
+        self.rooms = OrderedDict()  # live rooms by id, least recently entered first
+        self.snapshots = {}  # room id -> (cleared, packed enemies)
         self.current_room_id = 0
-        self.generate_level()
-
-    def generate_level(self):
-        # Simple fixed level
-        room0 = Room(0)
-        room1 = Room(1, enemies=[Enemy(random.randint(100,700), random.randint(100,500), random.choices([0,1,2,3], weights=[5,3,2,1])[0]) for _ in range(5)])
-        room2 = Room(2, enemies=[Enemy(SCREEN_WIDTH//2, 100, 4)], boss=True)
-        self.rooms = [room0, room1, room2]
-
-# Main game function
-def main():
-    high_score_file = 'high_score.txt'
-    if os.path.exists(high_score_file):
-        with open(high_score_file, 'r') as f:
-            high_score = int(f.read().strip())
-    else:
-        high_score = 0
-
-    level = Level(1)
-    current_room = level.rooms[level.current_room_id]
-    enemies = current_room.enemies
-
-    player = Player(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
-    bullets = []
-    coins = []
-    powerups = []
-    particles = []
-    stars = [(random.randint(0, SCREEN_WIDTH), random.randint(0, SCREEN_HEIGHT)) for _ in range(100)]
-    score = 0
-    running = True
-    paused = False
-    game_state = 'playing'  # playing, level_complete
-    last_powerup_spawn = 0
-    powerup_spawn_rate = 10000  # ms
-    last_machine_gun_time = 0
-    machine_gun_rate = 100  # ms
-
-    while running:
-        dt = clock.tick(FPS)
-        current_time = pygame.time.get_ticks()
-
-        # Events
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_q:
-                    player.weapon = (player.weapon + 1) % 4  # switch weapon
-                elif event.key == pygame.K_p:
-                    paused = not paused
-                elif event.key == pygame.K_e:
-                    if current_time - player.last_sword_time > player.sword_cooldown:
-                        player.last_sword_time = current_time
-                        # Sword slash: damage enemies in front
-                        slash_range = 50
-                        slash_damage = 50
-                        for enemy in enemies[:]:
-                            dx = enemy.x + enemy.size//2 - (player.x + PLAYER_SIZE//2)
-                            dy = enemy.y + enemy.size//2 - (player.y + PLAYER_SIZE//2)
-                            dist = math.sqrt(dx**2 + dy**2)
-                            if dist < slash_range:
-                                enemy.health -= slash_damage
-                                if enemy.health <= 0:
-                                    enemies.remove(enemy)
-                                    score += 10
-                                    kills_this_wave += 1
-                                    coins.append(Coin(enemy.x + enemy.size//2, enemy.y + enemy.size//2))
-                                    if kills_this_wave >= 10:
-                                        wave += 1
-                                        kills_this_wave = 0
-                                        enemy_spawn_rate = max(500, enemy_spawn_rate - 200)
-                        # Add slash particles
-                        for _ in range(10):
-                            angle = random.uniform(0, 2*math.pi)
-                            speed = random.uniform(1, 3)
-                            particles.append(Particle(player.x + PLAYER_SIZE//2, player.y + PLAYER_SIZE//2, math.cos(angle)*speed, math.sin(angle)*speed, ORANGE, 30))
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:  # Left click
-                    mouse_x, mouse_y = pygame.mouse.get_pos()
-                    if player.weapon == 0:  # pistol
-                        bullets.append(Bullet(player.x + PLAYER_SIZE//2, player.y + PLAYER_SIZE//2, mouse_x, mouse_y, 10))
-                        # Add muzzle flash
-                        for _ in range(5):
-                            angle = random.uniform(0, 2*math.pi)
-                            speed = random.uniform(0.5, 2)
-                            particles.append(Particle(player.x + PLAYER_SIZE//2, player.y + PLAYER_SIZE//2, math.cos(angle)*speed, math.sin(angle)*speed, YELLOW, 20))
-                    elif player.weapon == 1:  # shotgun
-                        for angle in [-0.2, 0, 0.2]:
-                            rad = math.atan2(mouse_y - (player.y + PLAYER_SIZE//2), mouse_x - (player.x + PLAYER_SIZE//2)) + angle
-                            tx = player.x + PLAYER_SIZE//2 + math.cos(rad) * 100
-                            ty = player.y + PLAYER_SIZE//2 + math.sin(rad) * 100
-                            bullets.append(Bullet(player.x + PLAYER_SIZE//2, player.y + PLAYER_SIZE//2, tx, ty, 5))
-                        # Add particles
-                        for _ in range(10):
-                            angle = random.uniform(0, 2*math.pi)
-                            speed = random.uniform(1, 3)
-                            particles.append(Particle(player.x + PLAYER_SIZE//2, player.y + PLAYER_SIZE//2, math.cos(angle)*speed, math.sin(angle)*speed, ORANGE, 30))
-                    elif player.weapon == 2:  # machine gun
-                        pass  # handled in update
-                    elif player.weapon == 3:  # sniper
-                        bullets.append(Bullet(player.x + PLAYER_SIZE//2, player.y + PLAYER_SIZE//2, mouse_x, mouse_y, 50))
-                        # Add particles
-                        for _ in range(3):
-                            angle = random.uniform(0, 2*math.pi)
-                            speed = random.uniform(0.5, 1.5)
-                            particles.append(Particle(player.x + PLAYER_SIZE//2, player.y + PLAYER_SIZE//2, math.cos(angle)*speed, math.sin(angle)*speed, PURPLE, 40))
-
-        if not paused and game_state == 'playing':
-            # Keys
-            keys = pygame.key.get_pressed()
-            player.move(keys)
-
-            # Spawn powerups
-            if current_time - last_powerup_spawn > powerup_spawn_rate:
-                x = random.randint(0, SCREEN_WIDTH)
-                y = random.randint(0, SCREEN_HEIGHT)
-                type_ = random.choice([0, 1])
-                powerups.append(PowerUp(x, y, type_))
-                last_powerup_spawn = current_time
-
-            # Update enemies
-            for enemy in enemies[:]:
-                enemy.move_towards(player.x + PLAYER_SIZE//2, player.y + PLAYER_SIZE//2)
-
-                # Check collision with player
-                if (enemy.x < player.x + PLAYER_SIZE and enemy.x + enemy.size > player.x and
-                    enemy.y < player.y + PLAYER_SIZE and enemy.y + enemy.size > player.y):
-                    player.health -= 10
-                    enemies.remove(enemy)
-                    if player.health <= 0:
-                        running = False
-
-            # Update bullets
-            for bullet in bullets[:]:
-                bullet.move()
-                # Remove if off screen
-                if (bullet.x < 0 or bullet.x > SCREEN_WIDTH or
-                    bullet.y < 0 or bullet.y > SCREEN_HEIGHT):
-                    bullets.remove(bullet)
-                else:
-                    # Check collision with enemies
-                    for enemy in enemies[:]:
-                        if (bullet.x - BULLET_SIZE < enemy.x + enemy.size and bullet.x + BULLET_SIZE > enemy.x and
-                            bullet.y - BULLET_SIZE < enemy.y + enemy.size and bullet.y + BULLET_SIZE > enemy.y):
-                            enemy.health -= bullet.damage
-                            bullets.remove(bullet)
-                            if enemy.health <= 0:
-                                # explosion
-                                num_particles = 20 if enemy.type == 4 else 10
-                                for _ in range(num_particles):
-                                    angle = random.uniform(0, 2*math.pi)
-                                    speed = random.uniform(1, 4)
-                                    particles.append(Particle(enemy.x + enemy.size//2, enemy.y + enemy.size//2, math.cos(angle)*speed, math.sin(angle)*speed, ORANGE, 40))
-                                enemies.remove(enemy)
-                                score += 10
-                                # spawn coin
-                                coins.append(Coin(enemy.x + enemy.size//2, enemy.y + enemy.size//2))
-                            break
-
-            # Machine gun
-            if player.weapon == 2 and pygame.mouse.get_pressed()[0] and current_time - last_machine_gun_time > machine_gun_rate:
-                mouse_x, mouse_y = pygame.mouse.get_pos()
-                bullets.append(Bullet(player.x + PLAYER_SIZE//2, player.y + PLAYER_SIZE//2, mouse_x, mouse_y, 5))
-                last_machine_gun_time = current_time
-                # Add particles
-                for _ in range(3):
-                    angle = random.uniform(0, 2*math.pi)
-                    speed = random.uniform(0.5, 1.5)
-                    particles.append(Particle(player.x + PLAYER_SIZE//2, player.y + PLAYER_SIZE//2, math.cos(angle)*speed, math.sin(angle)*speed, RED, 15))
-
-            # Update coins
-            for coin in coins[:]:
-                if (coin.x - COIN_SIZE < player.x + PLAYER_SIZE and coin.x + COIN_SIZE > player.x and
-                    coin.y - COIN_SIZE < player.y + PLAYER_SIZE and coin.y + COIN_SIZE > player.y):
-                    coins.remove(coin)
-                    score += 5
-
-            # Update powerups
-            for powerup in powerups[:]:
-                if (powerup.x - POWERUP_SIZE < player.x + PLAYER_SIZE and powerup.x + POWERUP_SIZE > player.x and
-                    powerup.y - POWERUP_SIZE < player.y + PLAYER_SIZE and powerup.y + POWERUP_SIZE > player.y):
-                    if powerup.type == 0:
-                        player.health = min(player.max_health, player.health + 20)
-                    elif powerup.type == 1:
-                        player.speed += 1
-                    powerups.remove(powerup)
-
-            # Check transition
-            if current_room.cleared:
-                for door_x, door_y, next_id in current_room.doors:
-                    dx = player.x + PLAYER_SIZE//2 - door_x
-                    dy = player.y + PLAYER_SIZE//2 - door_y
-                    if math.sqrt(dx**2 + dy**2) < 50:
-                        level.current_room_id = next_id
-                        current_room = level.rooms[next_id]
-                        enemies = current_room.enemies
-                        player.x = SCREEN_WIDTH//2
-                        player.y = SCREEN_HEIGHT//2
-                        break
+
+    def enter(self, room_id):
+        self.current_room_id = room_id
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self.prefetcher.take((self.num, room_id), generate_room, self.seed, room_id, self.graph,
+                                        self.enemy_pool)
+            snapshot = self.snapshots.pop(room_id, None)
+            if snapshot is None:
+                room.populate()
             else:
-                # Check room clear
-                if not enemies:
-                    current_room.cleared = True
-                    if current_room.boss:
-                        game_state = 'level_complete'
-
-
-            # Update particles
-            for particle in particles[:]:
-                particle.update()
-                if particle.age > particle.lifetime:
-                    particles.remove(particle)
-
-        # Draw
-        screen.fill(DARK_BLUE)
-        for star in stars:
-            pygame.draw.circle(screen, WHITE, star, 1)
-        player.draw(screen)
-        for door_x, door_y, _ in current_room.doors:
-            color = GREEN if current_room.cleared else RED
-            pygame.draw.circle(screen, color, (door_x, door_y), 20)
-        for enemy in enemies:
-            enemy.draw(screen)
-        for bullet in bullets:
-            bullet.draw(screen)
-        for coin in coins:
-            coin.draw(screen)
-        for powerup in powerups:
-            powerup.draw(screen)
-        for particle in particles:
-            particle.draw(screen)
+                self.restore(room, snapshot)
+            self.rooms[room_id] = room
+        self.rooms.move_to_end(room_id)
+        while len(self.rooms) > LIVE_ROOMS:
+            self.evict(next(iter(self.rooms)))
+
+        wanted = {(self.num, neighbor) for neighbor in self.graph.neighbors(room_id) if neighbor not in self.rooms}
+        self.prefetcher.discard(keep=lambda key: key in wanted or key[0] != self.num)
+        for key in wanted:
+            self.prefetcher.request(key, generate_room, self.seed, key[1], self.graph, self.enemy_pool)
+        return room
+
+    def evict(self, room_id):
+        room = self.rooms.pop(room_id)
+        enemies = pack_entities((enemy.x, enemy.y, enemy.type, enemy.health) for enemy in room.enemies)
+        self.snapshots[room_id] = (room.cleared, enemies)
+        room.enemies.clear()
+
+    def restore(self, room, snapshot):
+        cleared, enemies = snapshot
+        room.cleared = cleared
+        room.spawns = []
+        for x, y, enemy_type, health in unpack_entities(enemies):
+            enemy = self.enemy_pool.acquire(x, y, enemy_type)
+            enemy.health = health
+            room.enemies.append(enemy)
+
+    # Hand every built room's enemies back to the pool and drop queued builds
+    def close(self):
+        for room in self.rooms.values():
+            room.enemies.clear()
+        self.rooms.clear()
+        self.prefetcher.discard(keep=lambda key: key[0] != self.num)
+
+    # The door of room that leads towards goal_id, or None
+    def door_towards(self, room, goal_id):
+        target = self.graph.step_towards(room.id, goal_id)
+        for door in room.doors:
+            if door[2] == target:
+                return door
+        return None
+
+# Per-tick player input, decoupled from pygame so the simulation can run headless
+class Inputs:
+    def __init__(self, left=False, right=False, up=False, down=False,
+                 mouse_x=0, mouse_y=0, firing=False, events=()):
+        self.left = left
+        self.right = right
+        self.up = up
+        self.down = down
+        self.mouse_x = mouse_x
+        self.mouse_y = mouse_y
+        self.firing = firing  # left mouse button held
+        self.events = events
+
+# Seed for one level's dungeon, from the world seed alone
+def level_seed(seed, level_num):
+    return f"{seed}:{level_num}"
+
+# Game state and rules, stepped one tick at a time without touching the
+# display. `player` is the first of `players`; co-op games add more with
+# add_player(). Enemies go for the nearest living player, and the run is over
+# when none is left.
+class World:
+    def __init__(self, seed=None, profiler=None):
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.rng = random.Random(self.seed)
+        self.enemy_pool = Pool(Enemy)
+        self.bullet_pool = Pool(Bullet)
+        self.coin_pool = Pool(Coin)
+        self.powerup_pool = Pool(PowerUp)
+        self.prefetcher = Prefetcher()
+        self.level = Level(1, self.level_seed(1), self.enemy_pool, self.prefetcher)
+        self.current_room = self.level.enter(0)
+        self.enemies = self.current_room.enemies
+        self.player = Player(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+        self.players = [self.player]
+        self.bullets = LiveList(pool=self.bullet_pool)
+        self.coins = LiveList(pool=self.coin_pool)
+        self.powerups = LiveList(pool=self.powerup_pool)
+        self.particles = ParticleSystem(rng=np.random.default_rng(self.rng.getrandbits(64)))
+        self.separation = ENEMY_SEPARATION
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.stars = [(self.rng.randint(0, SCREEN_WIDTH), self.rng.randint(0, SCREEN_HEIGHT)) for _ in range(100)]
+        self.enemy_grid = SpatialHash()
+        self.coin_grid = SpatialHash()
+        self.powerup_grid = SpatialHash()
+        self.score = 0
+        self.time = 0  # simulated ms
+        self.ticks = 0
+        self.scale = 1  # length of the current tick in MOTION_UNIT_MS
+        self.interpolate = False  # whether the last tick moved anything worth interpolating
+        self.game_over = False
+        self.paused = False
+        self.game_state = 'playing'  # playing, level_complete
+        self.level_complete_time = 0
+        self.last_powerup_spawn = 0
+        self.room_entered_time = 0
+        # Running totals for balancing; room_clears holds (level, room id, kind, ms to clear)
+        self.stats = {'damage_taken': 0, 'coins': 0, 'kills': 0, 'room_clears': []}
+
+    # Advance one tick of dt ms. Movement scales with dt, so the same inputs
+    # play out at the same speed whatever the tick rate. inputs is one Inputs
+    # for the first player, or a sequence with one per player.
+    def step(self, inputs, dt):
+        self.time += dt
+        self.ticks += 1
+        self.scale = dt / MOTION_UNIT_MS
+        self.interpolate = False
+        if isinstance(inputs, Inputs):
+            inputs = (inputs,)
+        phase = self.profiler.phase
+        with phase('events'):
+            for player, player_inputs in zip(self.players, inputs):
+                for event in player_inputs.events:
+                    self.handle_event(event, player_inputs, player)
+
+        if not self.paused and self.players:
+            if self.game_state == 'level_complete':
+                if self.time - self.level_complete_time >= LEVEL_COMPLETE_DELAY:
+                    self.next_level()
+            else:
+                self.update(inputs)
+                self.interpolate = True
+
+        # Drop everything killed this tick in one pass and recycle it
+        with phase('compact'):
+            self.enemies.compact()
+            self.bullets.compact()
+            self.coins.compact()
+            self.powerups.compact()
+
+    def update(self, inputs):
+        phase = self.profiler.phase
+        players = [(player, player_inputs) for player, player_inputs in zip(self.players, inputs)
+                   if player.health > 0]
+        with phase('player'):
+            room = self.current_room
+            tiles = room.tiles if room.walled else None
+            for player, player_inputs in players:
+                player.move(player_inputs, self.scale, tiles, room.width, room.height)
+            self.spawn_powerups()
+        with phase('enemies'):
+            self.update_enemies()
+        with phase('bullets'):
+            self.update_bullets()
+            for player, player_inputs in players:
+                if (player.weapon == 2 and player_inputs.firing and
+                        self.time - player.last_machine_gun_time > MACHINE_GUN_RATE):
+                    self.fire_machine_gun(player, player_inputs.mouse_x, player_inputs.mouse_y)
+        with phase('pickups'):
+            self.collect_pickups()
+            self.update_room()
+        with phase('particles'):
+            self.particles.update(self.scale)
+
+    # Players still in the game
+    def living_players(self):
+        return [player for player in self.players if player.health > 0]
+
+    # A co-op player, placed in its own spawn slot of the current room; the
+    # players already in it stay where they are
+    def add_player(self):
+        player = Player(0, 0)
+        self.players.append(player)
+        self.place_player(player, len(self.players) - 1)
+        return player
+
+    def remove_player(self, player):
+        self.players.remove(player)
+        if player is self.player:
+            self.player = self.players[0] if self.players else None
+
+    def handle_event(self, event, inputs, player=None):
+        player = player or self.player
+        if player.health <= 0:
+            return
+        if event == EVENT_SWITCH_WEAPON:
+            player.weapon = (player.weapon + 1) % 4
+        elif event == EVENT_PAUSE:
+            self.paused = not self.paused
+        elif event == EVENT_SLASH:
+            if self.time - player.last_sword_time > player.sword_cooldown:
+                player.last_sword_time = self.time
+                self.slash(player)
+        elif event == EVENT_SHOOT:
+            self.shoot(player, inputs.mouse_x, inputs.mouse_y)
+
+    # Sword slash: damage enemies around the player
+    def slash(self, player):
+        px, py = player.center()
+        self.index_enemies()
+        for enemy in self.enemy_grid.query_radius(px, py, SLASH_RANGE):
+            enemy.health -= SLASH_DAMAGE
+            if enemy.health <= 0:
+                self.kill_enemy(enemy)
+        self.particles.emit(10, (px, py), (1, 3), ORANGE, 30)
+
+    def shoot(self, player, mouse_x, mouse_y):
+        px, py = player.center()
+        weapon = player.weapon
+        if weapon == 0:  # pistol
+            self.bullets.append(self.bullet_pool.acquire(px, py, mouse_x, mouse_y, 10))
+            # Add muzzle flash
+            self.particles.emit(5, (px, py), (0.5, 2), YELLOW, 20)
+        elif weapon == 1:  # shotgun
+            for angle in [-0.2, 0, 0.2]:
+                rad = math.atan2(mouse_y - py, mouse_x - px) + angle
+                tx = px + math.cos(rad) * 100
+                ty = py + math.sin(rad) * 100
+                self.bullets.append(self.bullet_pool.acquire(px, py, tx, ty, 5))
+            self.particles.emit(10, (px, py), (1, 3), ORANGE, 30)
+        elif weapon == 2:  # machine gun
+            pass  # handled in step
+        elif weapon == 3:  # sniper
+            self.bullets.append(self.bullet_pool.acquire(px, py, mouse_x, mouse_y, 50, SNIPER_SPEED, SNIPER_PIERCE))
+            self.particles.emit(3, (px, py), (0.5, 1.5), PURPLE, 40)
+
+    def fire_machine_gun(self, player, mouse_x, mouse_y):
+        px, py = player.center()
+        self.bullets.append(self.bullet_pool.acquire(px, py, mouse_x, mouse_y, 5))
+        player.last_machine_gun_time = self.time
+        self.particles.emit(3, (px, py), (0.5, 1.5), RED, 15)
+
+    def spawn_powerups(self):
+        if self.time - self.last_powerup_spawn > POWERUP_SPAWN_RATE:
+            x = self.rng.randint(0, self.current_room.width)
+            y = self.rng.randint(0, self.current_room.height)
+            type_ = self.rng.choice([0, 1])
+            self.last_powerup_spawn = self.time
+            if self.current_room.tiles.blocked(x, y):
+                return
+            powerup = self.powerup_pool.acquire(x, y, type_)
+            self.powerups.append(powerup)
+            self.powerup_grid.insert(powerup, *powerup.bounds())
+
+    # Steer all enemies in one batch, then check them against the players. In
+    # rooms with walls they follow the room's flow field towards the nearest
+    # player and moves into walls are cut back per axis.
+    def update_enemies(self):
+        enemies = list(self.enemies)
+        players = self.living_players()
+        if not enemies or not players:
+            return
+        room = self.current_room
+        n = len(enemies)
+        pos = np.array([(enemy.x, enemy.y) for enemy in enemies], dtype=np.float64)
+        sizes = np.fromiter((enemy.size for enemy in enemies), np.float64, n)
+        speeds = np.fromiter((enemy.speed for enemy in enemies), np.float64, n) * self.scale
+        centers = [player.center() for player in players]
+        if len(players) == 1:
+            target = centers[0]
+        else:
+            # Each enemy seeks its nearest player
+            targets = np.array(centers, dtype=np.float64)
+            gaps = ((pos[:, None, :] - targets[None, :, :]) ** 2).sum(axis=2)
+            target = targets[gaps.argmin(axis=1)]
+        headings = None
+        if room.walled:
+            if room.flowfield is None:
+                room.flowfield = FlowField(room.tiles)
+            room.flowfield.update_many(centers, FLOWFIELD_BUDGET)
+            headings = room.flowfield.headings(pos[:, 0] + sizes / 2, pos[:, 1] + sizes / 2)
+        moved = steer(pos, sizes, speeds, target, self.separation, headings=headings)
+        if room.walled:
+            tiles = room.tiles
+            blocked = tiles.boxes_blocked(moved[:, 0], pos[:, 1], sizes, sizes)
+            moved[blocked, 0] = pos[blocked, 0]
+            blocked = tiles.boxes_blocked(moved[:, 0], moved[:, 1], sizes, sizes)
+            moved[blocked, 1] = pos[blocked, 1]
+        pos = moved
+        for enemy, (x, y) in zip(enemies, pos.tolist()):
+            enemy.prev_x = enemy.x
+            enemy.prev_y = enemy.y
+            enemy.x = x
+            enemy.y = y
+
+        # Check collision with players; an enemy that touches one is spent
+        x = pos[:, 0]
+        y = pos[:, 1]
+        for player in players:
+            touching = ((x < player.x + PLAYER_SIZE) & (x + sizes > player.x) &
+                        (y < player.y + PLAYER_SIZE) & (y + sizes > player.y))
+            for i in np.flatnonzero(touching):
+                if not enemies[i].alive:
+                    continue
+                player.health -= 10
+                self.stats['damage_taken'] += 10
+                self.enemies.kill(enemies[i])
+        if not self.living_players():
+            self.game_over = True
+
+    # Bullets move a whole tick at once whatever their speed. Each one's path
+    # for the tick is cut short at the first wall, the enemy grid supplies
+    # the enemies near it, and every (bullet, enemy) pair is swept in one
+    # batch; a bullet then damages enemies in the order its path reaches
+    # them, passing through as many as its pierce count allows.
+    def update_bullets(self):
+        self.index_enemies()
+        scale = self.scale
+        room = self.current_room
+        tiles = room.tiles
+        walled = room.walled
+        grid = self.enemy_grid
+        pad = BULLET_SIZE * 2
+        bullets = []
+        ends = []  # how far along its path each bullet gets, 0..1
+        stopped = []  # whether it hits a wall or leaves the room this tick
+        pairs = []  # (bullet index, enemy)
+        rows = []  # path and enemy box grown by the bullet's size, per pair
+        for bullet in self.bullets:
+            bullet.move(scale)
+            x0 = bullet.prev_x
+            y0 = bullet.prev_y
+            x1 = bullet.x
+            y1 = bullet.y
+            end = None
+            if walled:
+                end = tiles.raycast(x0, y0, x1, y1)
+            elif x1 < 0 or x1 > room.width or y1 < 0 or y1 > room.height:
+                end = 1.0
+            i = len(bullets)
+            bullets.append(bullet)
+            ends.append(1.0 if end is None else end)
+            stopped.append(end is not None)
+            dx = x1 - x0
+            dy = y1 - y0
+            for enemy in grid.query_aabb(min(x0, x1) - BULLET_SIZE, min(y0, y1) - BULLET_SIZE,
+                                         abs(dx) + pad, abs(dy) + pad):
+                if enemy.serial not in bullet.hits:
+                    pairs.append((i, enemy))
+                    rows.append((x0, y0, dx, dy, enemy.x - BULLET_SIZE, enemy.y - BULLET_SIZE, enemy.size + pad))
+
+        if pairs:
+            x0, y0, dx, dy, bx, by, size = np.array(rows).T
+            times = sweep_segments(x0, y0, dx, dy, bx, by, size, size).tolist()
+            # Bullets in list order, each one's hits in path order
+            for k in sorted(range(len(pairs)), key=lambda k: (pairs[k][0], times[k])):
+                i, enemy = pairs[k]
+                bullet = bullets[i]
+                if times[k] > ends[i] or not bullet.alive or not enemy.alive:
+                    continue
+                enemy.health -= bullet.damage
+                if bullet.pierce > 0:
+                    bullet.pierce -= 1
+                    bullet.hits += (enemy.serial,)
+                else:
+                    self.bullets.kill(bullet)
+                if enemy.health <= 0:
+                    # explosion
+                    num_particles = 20 if enemy.type == 4 else 10
+                    self.particles.emit(num_particles, (enemy.x + enemy.size//2, enemy.y + enemy.size//2), (1, 4), ORANGE, 40)
+                    self.kill_enemy(enemy)
+
+        for bullet, stop in zip(bullets, stopped):
+            if stop:
+                self.bullets.kill(bullet)
+
+    def kill_enemy(self, enemy):
+        self.enemies.kill(enemy)
+        self.enemy_grid.remove(enemy)
+        self.score += 10
+        self.stats['kills'] += 1
+        # spawn coin
+        coin = self.coin_pool.acquire(enemy.x + enemy.size//2, enemy.y + enemy.size//2)
+        self.coins.append(coin)
+        self.coin_grid.insert(coin, *coin.bounds())
+
+    def collect_pickups(self):
+        for player in self.living_players():
+            for coin in self.coin_grid.query_aabb(*player.bounds()):
+                self.coins.kill(coin)
+                self.coin_grid.remove(coin)
+                self.score += 5
+                self.stats['coins'] += 1
+            for powerup in self.powerup_grid.query_aabb(*player.bounds()):
+                if powerup.type == 0:
+                    player.health = min(player.max_health, player.health + 20)
+                elif powerup.type == 1:
+                    player.speed += 1
+                self.powerups.kill(powerup)
+                self.powerup_grid.remove(powerup)
+
+    # Any living player at a door of a cleared room takes everyone through
+    def update_room(self):
+        room = self.current_room
+        if room.cleared:
+            for door_x, door_y, next_id in room.doors:
+                if any(math.hypot(px - door_x, py - door_y) < 50
+                       for px, py in (player.center() for player in self.living_players())):
+                    self.enter_room(next_id)
+                    break
+        elif not self.enemies:
+            room.cleared = True
+            if room.id != 0:
+                kind = 'boss' if room.boss else 'combat'
+                self.stats['room_clears'].append((self.level.num, room.id, kind, self.time - self.room_entered_time))
+            if room.boss:
+                self.game_state = 'level_complete'
+                self.level_complete_time = self.time
+
+    # Seed a level's dungeon from the world seed, so any level can be built
+    # ahead of time without touching the gameplay RNG
+    def level_seed(self, level_num):
+        return level_seed(self.seed, level_num)
+
+    def enter_room(self, room_id):
+        self.current_room = self.level.enter(room_id)
+        self.enemies = self.current_room.enemies
+        self.room_entered_time = self.time
+        self.place_players()
+        if self.current_room.boss:
+            # The next level's graph is built while the boss is fought
+            num = self.level.num + 1
+            self.prefetcher.request(('graph', num), build_graph, self.level_seed(num), DUNGEON_ROOMS)
+
+    def next_level(self):
+        # Hand the finished level's enemies back before generating the next
+        self.level.close()
+        num = self.level.num + 1
+        seed = self.level_seed(num)
+        graph = self.prefetcher.take(('graph', num), build_graph, seed, DUNGEON_ROOMS)
+        self.level = Level(num, seed, self.enemy_pool, self.prefetcher, graph)
+        self.current_room = self.level.enter(0)
+        self.enemies = self.current_room.enemies
+        self.game_state = 'playing'
+        self.room_entered_time = self.time
+        self.place_players()
+
+    # Put the players in the middle of the room just entered and index its
+    # enemies, which the renderer culls through enemy_grid
+    def place_players(self):
+        for i, player in enumerate(self.players):
+            self.place_player(player, i)
+        self.index_enemies()
+
+    # Put player at spawn slot i around the current room's centre
+    def place_player(self, player, i):
+        x, y = self.current_room.center()
+        dx, dy = PLAYER_SPAWN_OFFSETS[i % len(PLAYER_SPAWN_OFFSETS)]
+        player.x = player.prev_x = x + dx
+        player.y = player.prev_y = y + dy
+
+    def entity_counts(self):
+        return {
+            'enemies': len(self.enemies),
+            'bullets': len(self.bullets),
+            'particles': len(self.particles),
+            'coins': len(self.coins),
+        }
+
+    # Final state compared between a recording and its replay; the digest
+    # covers every live entity's position and health
+    def summary(self):
+        player = self.player
+        entities = [(enemy.x, enemy.y, enemy.health) for enemy in self.enemies]
+        entities += [(bullet.x, bullet.y) for bullet in self.bullets]
+        entities += [(coin.x, coin.y) for coin in self.coins]
+        entities += [(powerup.x, powerup.y, powerup.type) for powerup in self.powerups]
+        return {
+            'ticks': self.ticks,
+            'time': self.time,
+            'score': self.score,
+            'level': self.level.num,
+            'room': self.current_room.id,
+            'player': [player.x, player.y, player.health, player.weapon],
+            'game_over': self.game_over,
+            'digest': zlib.crc32(repr(entities).encode()),
+        }
+
+    # Stop the prefetch thread, dropping the rooms it still had queued. The
+    # world's state stays readable, but it must not be stepped again.
+    def close(self):
+        self.prefetcher.shutdown(wait=True)
+
+    def pool_stats(self):
+        return {
+            'enemy': self.enemy_pool.stats(),
+            'bullet': self.bullet_pool.stats(),
+            'coin': self.coin_pool.stats(),
+            'powerup': self.powerup_pool.stats(),
+        }
+
+    # Rebuild the enemy broadphase from the live enemy list
+    def index_enemies(self):
+        grid = self.enemy_grid
+        grid.clear()
+        for enemy in self.enemies:
+            grid.insert(enemy, *enemy.bounds())
+
+# Scripted player for headless runs: shoots the nearest enemy and walks to the
+# door once the room is cleared
+def autopilot(world):
+    player = world.player
+    px, py = player.center()
+    events = []
+    target_x, target_y = px, py
+    firing = False
+    if world.enemies:
+        nearest = min(world.enemies, key=lambda e: (e.x - px)**2 + (e.y - py)**2)
+        target_x = nearest.x + nearest.size//2
+        target_y = nearest.y + nearest.size//2
+        if world.ticks % 10 == 0:
+            events.append(EVENT_SHOOT)
+        firing = True  # held fire only matters to the machine gun
+    elif world.current_room.doors:
+        room = world.current_room
+        door_x, door_y, _ = world.level.door_towards(room, world.level.graph.boss) or room.doors[0]
+        return Inputs(left=door_x < px - 2, right=door_x > px + 2,
+                      up=door_y < py - 2, down=door_y > py + 2,
+                      mouse_x=door_x, mouse_y=door_y)
+    return Inputs(mouse_x=target_x, mouse_y=target_y, firing=firing, events=events)
+
+# Read pygame's event queue and input state into an Inputs
+def poll_inputs():
+    events = []
+    quit_requested = False
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            quit_requested = True
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_q:
+                events.append(EVENT_SWITCH_WEAPON)
+            elif event.key == pygame.K_p:
+                events.append(EVENT_PAUSE)
+            elif event.key == pygame.K_e:
+                events.append(EVENT_SLASH)
+            elif event.key == pygame.K_F3:
+                events.append(EVENT_TOGGLE_PROFILER)
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            if event.button == 1:  # Left click
+                events.append(EVENT_SHOOT)
+    keys = pygame.key.get_pressed()
+    mouse_x, mouse_y = pygame.mouse.get_pos()
+    inputs = Inputs(left=keys[pygame.K_LEFT] or keys[pygame.K_a],
+                    right=keys[pygame.K_RIGHT] or keys[pygame.K_d],
+                    up=keys[pygame.K_UP] or keys[pygame.K_w],
+                    down=keys[pygame.K_DOWN] or keys[pygame.K_s],
+                    mouse_x=mouse_x, mouse_y=mouse_y,
+                    firing=pygame.mouse.get_pressed()[0],
+                    events=events)
+    return inputs, quit_requested
+
+# Draws a World through a camera that follows the player around rooms larger
+# than the screen. The static layer (starfield, walls, doors) is rendered in
+# chunks on demand and cached; the chunks under the camera are composed into
+# a background surface whenever the camera or the room changes. Entities off
+# the view are culled through the world's spatial grids, so a frame costs
+# what is on screen rather than what is in the room. In dirty-rect mode, while
+# the camera holds still, only the areas under last frame's and this frame's
+# sprites are restored and pushed to the display.
+class Renderer:
+    def __init__(self, screen, dirty_rects=True):
+        self.screen = screen
+        self.dirty_rects = dirty_rects
+        self.text = TextCache()
+        self.hud = Hud(self.text)
+        self.sprites = SpriteCache()
+        self.camera = Camera(*screen.get_size())
+        self.chunks = ChunkCache(self.render_chunk, CHUNK_TILES * TILE_SIZE, CHUNK_CACHE, screen)
+        self.starfield = None  # one screen of stars, tiled across the room
+        self.room = None  # room the cached chunks show
+        self.background = pygame.Surface(screen.get_size()).convert(screen)
+        self.background_key = None
+        self.room_key = None
+        self.last_rects = []
+        self.pending = None  # rects for present(), or None for a full flip
+        self.overlay = False  # profiler overlay, toggled with F3
+        self.overlay_slots = 0
+
+    # Drop the cached chunks when the room or its door state changes, and
+    # recompose the background when that or the camera moved
+    def update_background(self, world):
+        room = world.current_room
+        room_key = (world.level, room.id, room.cleared)
+        if room_key != self.room_key:
+            self.room_key = room_key
+            self.room = room
+            self.chunks.clear()
+        if self.starfield is None:
+            self.starfield = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert(self.screen)
+            self.starfield.fill(DARK_BLUE)
+            for star in world.stars:
+                pygame.draw.circle(self.starfield, WHITE, star, 1)
+        camera = self.camera
+        key = (room_key, camera.x, camera.y)
+        if key == self.background_key:
+            return False
+        self.background_key = key
+        self.chunks.draw(self.background, camera)
+        return True
+
+    # Static layer for the chunk whose top-left room pixel is (x, y)
+    def render_chunk(self, surface, x, y):
+        room = self.room
+        size = surface.get_width()
+        surface.fill(BLACK)
+        # Starfield tiles repeat every screen; a chunk spans at most two per axis
+        sx = x - x % SCREEN_WIDTH
+        sy = y - y % SCREEN_HEIGHT
+        surface.set_clip(pygame.Rect(-x, -y, room.width, room.height))
+        surface.blits([(self.starfield, (tx - x, ty - y))
+                       for tx in (sx, sx + SCREEN_WIDTH) if tx < x + size
+                       for ty in (sy, sy + SCREEN_HEIGHT) if ty < y + size], doreturn=False)
+        surface.set_clip(None)
+        tx = x // TILE_SIZE
+        ty = y // TILE_SIZE
+        for wx, wy, w, h in room.tiles.rects(tx, ty, tx + size // TILE_SIZE, ty + size // TILE_SIZE):
+            surface.fill(WALL_COLOR, (wx - x, wy - y, w, h))
+        color = GREEN if room.cleared else RED
+        for door_x, door_y, _ in room.doors:
+            pygame.draw.circle(surface, color, (door_x - x, door_y - y), 20)
+
+    # alpha is how far the frame falls between the last two ticks (0..1)
+    def draw(self, world, high_score, alpha=1):
+        if not world.interpolate:
+            alpha = 1
+        screen = self.screen
+        room = world.current_room
+        player = world.player
+        hud = self.hud
+        hud.set('health', f"Health: {player.health}", (10, 10))
+        hud.set('score', f"Score: {world.score}", (10, 40))
+        hud.set('level', f"Level: {world.level.num}", (10, 70))
+        hud.set('room', f"Room: {room.id}", (10, 100))
+        hud.set('weapon', f"Weapon: {WEAPON_NAMES[player.weapon]}", (10, 130))
+        hud.set('high_score', f"High Score: {'...' if high_score is None else high_score}", (10, 160))
+        hud.set('speed', f"Speed: {player.speed}", (10, 190))
+        self.update_overlay(world.profiler)
+
+        camera = self.camera
+        camera.follow(lerp(player.prev_x, player.x, alpha) + PLAYER_SIZE//2,
+                      lerp(player.prev_y, player.y, alpha) + PLAYER_SIZE//2, room.width, room.height)
+        full_area = screen.get_width() * screen.get_height()
+        full = self.update_background(world) or not self.dirty_rects
+        if not full:
+            erase = self.last_rects + hud.stale + hud.rects()
+            # Thousands of small restores cost more than one full blit
+            full = sum(rect.w * rect.h for rect in erase) > DIRTY_FULL_FRAME_RATIO * full_area
+        if full:
+            screen.blit(self.background, (0, 0))
+        else:
+            screen.blits([(self.background, rect, rect) for rect in erase], doreturn=False)
+
+        # One batched blit per layer from pre-rendered sprites, of only what
+        # is in view
+        sprites = self.sprites
+        view = camera.rect(CULL_MARGIN)
+        enemies = world.enemy_grid.query_aabb(*view)
+        vx0, vy0, vw, vh = view
+        vx1 = vx0 + vw
+        vy1 = vy0 + vh
+        bullets = [bullet for bullet in world.bullets if vx0 < bullet.x < vx1 and vy0 < bullet.y < vy1]
+        cx = camera.x
+        cy = camera.y
+        drawn = screen.blits(shift([p.sprite(sprites, alpha) for p in world.players if p.health > 0], cx, cy))
+        drawn += screen.blits(shift([enemy.sprite(sprites, alpha) for enemy in enemies], cx, cy))
+        drawn += screen.blits(shift([bar for bar in (enemy.health_bar(sprites, alpha) for enemy in enemies)
+                                     if bar is not None], cx, cy))
+        drawn += screen.blits(shift([bullet.sprite(sprites, alpha) for bullet in bullets], cx, cy))
+        drawn += screen.blits(shift([coin.sprite(sprites) for coin in world.coin_grid.query_aabb(*view)], cx, cy))
+        drawn += screen.blits(shift([powerup.sprite(sprites) for powerup in world.powerup_grid.query_aabb(*view)],
+                                    cx, cy))
+        offset = (cx, cy) if cx or cy else None
+        particle_rect = world.particles.bounds(alpha, offset)
+        world.particles.draw(screen, alpha, offset)
+        if particle_rect is not None:
+            drawn.append(particle_rect.clip(screen.get_rect()))
 
         # UI
-        font = pygame.font.SysFont(None, 24)
-        health_text = font.render(f"Health: {player.health}", True, WHITE)
-        score_text = font.render(f"Score: {score}", True, WHITE)
-        high_score_text = font.render(f"High Score: {high_score}", True, WHITE)
-        level_text = font.render(f"Level: {level.num}", True, WHITE)
-        room_text = font.render(f"Room: {current_room.id}", True, WHITE)
-        weapon_names = ['Pistol', 'Shotgun', 'Machine Gun', 'Sniper']
-        weapon_text = font.render(f"Weapon: {weapon_names[player.weapon]}", True, WHITE)
-        speed_text = font.render(f"Speed: {player.speed}", True, WHITE)
-        screen.blit(health_text, (10, 10))
-        screen.blit(score_text, (10, 40))
-        screen.blit(high_score_text, (10, 160))
-        screen.blit(level_text, (10, 70))
-        screen.blit(room_text, (10, 100))
-        screen.blit(weapon_text, (10, 130))
-        screen.blit(speed_text, (10, 190))
-
-        if paused:
-            pause_font = pygame.font.SysFont(None, 48)
-            pause_text = pause_font.render("Paused - Press P to Resume", True, WHITE)
-            screen.blit(pause_text, (SCREEN_WIDTH//2 - 200, SCREEN_HEIGHT//2 - 24))
-        elif game_state == 'level_complete':
-            complete_font = pygame.font.SysFont(None, 48)
-            complete_text = complete_font.render("Level Complete!", True, GREEN)
-            screen.blit(complete_text, (SCREEN_WIDTH//2 - 150, SCREEN_HEIGHT//2 - 24))
-
-        pygame.display.flip()
-
-        if game_state == 'level_complete':
-            pygame.time.wait(2000)
-            # Next level
-            level = Level(level.num + 1)
-            current_room = level.rooms[0]
-            enemies = current_room.enemies
-            game_state = 'playing'
-            player.x = SCREEN_WIDTH//2
-            player.y = SCREEN_HEIGHT//2
+        hud_rects = hud.draw(screen)
+        if world.paused:
+            pause_text = self.text.render("Paused - Press P to Resume", 48, WHITE)
+            drawn.append(screen.blit(pause_text, (SCREEN_WIDTH//2 - 200, SCREEN_HEIGHT//2 - 24)))
+        elif world.game_state == 'level_complete':
+            complete_text = self.text.render("Level Complete!", 48, GREEN)
+            drawn.append(screen.blit(complete_text, (SCREEN_WIDTH//2 - 150, SCREEN_HEIGHT//2 - 24)))
+
+        if full:
+            self.pending = None
+        else:
+            dirty = self.last_rects + drawn + hud_rects
+            area = sum(rect.w * rect.h for rect in dirty)
+            self.pending = dirty if area <= DIRTY_FULL_FRAME_RATIO * full_area else None
+        self.last_rects = drawn
+
+    # Profiler lines in the top right corner, refreshed a few times a second so
+    # they stay readable and cost a text render only when they change
+    def update_overlay(self, profiler):
+        hud = self.hud
+        if not self.overlay:
+            for i in range(self.overlay_slots):
+                hud.remove(('profiler', i))
+            self.overlay_slots = 0
+            return
+        if self.overlay_slots and profiler.frame_index % PROFILER_OVERLAY_REFRESH:
+            return
+        lines = profiler.overlay_lines() or ["profiling..."]
+        for i, line in enumerate(lines):
+            hud.set(('profiler', i), line, (SCREEN_WIDTH - 330, 10 + i * 16), 18, YELLOW)
+        for i in range(len(lines), self.overlay_slots):
+            hud.remove(('profiler', i))
+        self.overlay_slots = len(lines)
+
+    def present(self):
+        if self.pending is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.pending)
+
+    def draw_game_over(self, score, high_score):
+        screen = self.screen
+        screen.fill(BLACK)
+        game_over_text = self.text.render("Game Over", 48, RED)
+        final_score_text = self.text.render(f"Final Score: {score} (High: {high_score})", 48, WHITE)
+        screen.blit(game_over_text, (SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2 - 50))
+        screen.blit(final_score_text, (SCREEN_WIDTH//2 - 150, SCREEN_HEIGHT//2))
+
+# Move (surface, (x, y)) blits from room to screen coordinates
+def shift(blits, cx, cy):
+    if not (cx or cy):
+        return blits
+    return [(surface, (x - cx, y - cy)) for surface, (x, y) in blits]
+
+# Step a world as fast as the CPU allows, with no window and no draw calls
+def run_headless(ticks, seed=None, controller=autopilot, profiler=None, tick_rate=TICK_RATE):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    world = World(seed, profiler)
+    profiler = world.profiler
+    dt = 1000 / tick_rate
+    start = time.perf_counter()
+    for _ in range(ticks):
+        profiler.begin_frame()
+        world.step(controller(world), dt)
+        profiler.end_frame(world.entity_counts() if profiler.enabled else None)
+        if world.game_over:
+            break
+    elapsed = time.perf_counter() - start
+    world.close()
+    return world, elapsed
+
+# Step a world through a recorded input log as fast as possible
+def replay_headless(log, profiler=None):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    world = World(log.seed, profiler)
+    profiler = world.profiler
+    start = time.perf_counter()
+    for dt, *fields in log:
+        profiler.begin_frame()
+        world.step(Inputs(*fields), dt)
+        profiler.end_frame(world.entity_counts() if profiler.enabled else None)
+    elapsed = time.perf_counter() - start
+    world.close()
+    return world, elapsed
+
+# Compare a replayed world with the state saved in its log; True when equal
+def check_replay(log, world):
+    diff = diff_states(log.final_state, world.summary())
+    if not diff:
+        print(f"replay matches recording after {world.ticks} ticks")
+        return True
+    for key, (expected, actual) in diff.items():
+        print(f"replay differs: {key} recorded {expected}, replayed {actual}", file=sys.stderr)
+    return False
+
+# The best score on disk, read on a background thread so the first frame
+# never waits on the file; value is None until the read finishes
+class HighScore:
+    def __init__(self, path=HIGH_SCORE_FILE):
+        self.path = path
+        self.value = None
+        self.reader = threading.Thread(target=self.load, name='high-score', daemon=True)
+        self.reader.start()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                self.value = int(f.read().strip())
+        except (OSError, ValueError):
+            self.value = 0
+
+    # The stored best once loaded, waiting for it if asked to
+    def get(self, wait=False):
+        if wait:
+            self.reader.join()
+        return self.value
+
+    # Store score if it beats the best; returns the best afterwards
+    def submit(self, score):
+        best = self.get(wait=True)
+        if score > best:
+            self.value = best = score
+            with open(self.path, 'w') as f:
+                f.write(str(score))
+        return best
+
+# Main game function. The world advances in fixed ticks of 1000 / tick_rate
+# ms, as many per frame as the elapsed time calls for (at most
+# MAX_CATCH_UP_TICKS), and frames are drawn interpolated between the last two
+# ticks. With record set, every tick's inputs are logged to that file; with
+# replay set (a loaded log), the log drives the world at its recorded pace and
+# live input only quits or toggles the profiler overlay.
+#
+# Only the display is initialized up front. Fonts load on first render, the
+# high score is read in the background, and the mixer starts with the music
+# once the first frame is up; the time that frame took is reported.
+def main(seed=None, dirty_rects=True, profile_out=None, profile_format=None, record=None, replay=None,
+         tick_rate=TICK_RATE, sound=True):
+    entered = time.perf_counter()
+    high_score = HighScore()
+    pygame.display.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Soul Knight Clone")
+    clock = pygame.time.Clock()
+    audio = Audio(enabled=sound)
+    window_ready = time.perf_counter()
+
+    # Recording a session keeps the profiler on; otherwise F3 turns it on
+    # together with the overlay
+    profiler = Profiler(record=profile_out is not None)
+    phase = profiler.phase
+    world = World(replay.seed if replay is not None else seed, profiler)
+    recorder = Recorder(world.seed) if record else None
+    replay_ticks = iter(replay) if replay is not None else None
+    renderer = Renderer(screen, dirty_rects)
+    world_ready = time.perf_counter()
+    first_frame = None
+    tick_ms = 1000 / tick_rate
+    accumulator = 0  # real ms not yet simulated
+    skipped = 0  # frames skipped in a row
+    events = []  # events polled since the last tick
+    running = True
+    while running and not world.game_over:
+        profiler.begin_frame()
+        with phase('wait'):
+            accumulator += clock.tick(FPS)
+        with phase('input'):
+            inputs, quit_requested = poll_inputs()
+            # Aim in room coordinates, through the camera of the last frame drawn
+            inputs.mouse_x, inputs.mouse_y = renderer.camera.to_world(inputs.mouse_x, inputs.mouse_y)
+        if quit_requested:
+            running = False
+        if EVENT_TOGGLE_PROFILER in inputs.events:
+            renderer.overlay = not renderer.overlay
+            profiler.enabled = renderer.overlay or profiler.record
+        events.extend(inputs.events)
+
+        ticks = 0
+        while accumulator >= tick_ms and ticks < MAX_CATCH_UP_TICKS and not world.game_over:
+            if replay_ticks is not None:
+                recorded = next(replay_ticks, None)
+                if recorded is None:
+                    running = False
+                    break
+                dt, *fields = recorded
+                tick_inputs = Inputs(*fields)
+            else:
+                # Held keys apply to every tick; events only to the first
+                dt = tick_ms
+                tick_inputs = Inputs(inputs.left, inputs.right, inputs.up, inputs.down,
+                                     inputs.mouse_x, inputs.mouse_y, inputs.firing, events)
+                events = []
+            if recorder is not None:
+                recorder.record(tick_inputs, dt)
+            world.step(tick_inputs, dt)
+            accumulator -= dt
+            ticks += 1
+
+        if accumulator >= tick_ms:
+            # Still behind after the catch-up cap: skip drawing so the next
+            # frames go to simulation, and past MAX_FRAME_SKIP drop the backlog
+            # rather than fall further behind
+            if skipped < MAX_FRAME_SKIP:
+                skipped += 1
+                profiler.end_frame(world.entity_counts() if profiler.enabled else None)
+                continue
+            accumulator %= tick_ms
+        skipped = 0
+        with phase('draw'):
+            renderer.draw(world, high_score.get(), accumulator / tick_ms)
+        with phase('present'):
+            renderer.present()
+        profiler.end_frame(world.entity_counts() if profiler.enabled else None)
+        if first_frame is None:
+            first_frame = time.perf_counter()
+            print(f"First frame {(first_frame - STARTED) * 1000:.0f} ms after start: "
+                  f"imports {(entered - STARTED) * 1000:.0f}, window {(window_ready - entered) * 1000:.0f}, "
+                  f"world {(world_ready - window_ready) * 1000:.0f}, "
+                  f"first draw {(first_frame - world_ready) * 1000:.0f} ms")
+            audio.play_music(MUSIC_FILE)
+
+    if profile_out:
+        fmt = profiler.dump(profile_out, profile_format)
+        print(f"Profile ({fmt}, {len(profiler.frames)} frames) written to {profile_out}")
+    if recorder is not None:
+        size = recorder.save(record, world.summary())
+        print(f"Recorded {recorder.ticks} ticks ({size} bytes) to {record}")
+    if replay is not None:
+        check_replay(replay, world)
 
     # Game over
-    if score > high_score:
-        high_score = score
-        with open(high_score_file, 'w') as f:
-            f.write(str(high_score))
-    screen.fill(BLACK)
-    font = pygame.font.SysFont(None, 48)
-    game_over_text = font.render("Game Over", True, RED)
-    final_score_text = font.render(f"Final Score: {score} (High: {high_score})", True, WHITE)
-    screen.blit(game_over_text, (SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2 - 50))
-    screen.blit(final_score_text, (SCREEN_WIDTH//2 - 150, SCREEN_HEIGHT//2))
+    world.close()
+    audio.stop()
+    score = world.score
+    best = high_score.get(wait=True) if replay is not None else high_score.submit(score)
+    renderer.draw_game_over(score, best)
     pygame.display.flip()
     pygame.time.wait(3000)
 
@@ -489,4 +1328,50 @@ def main():
     sys.exit()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Soul Knight Clone")
+    parser.add_argument('--seed', type=int, help="seed for the game's random number generator")
+    parser.add_argument('--headless', action='store_true', help="simulate without a window as fast as possible")
+    parser.add_argument('--ticks', type=int, default=10000, help="ticks to simulate in headless mode")
+    parser.add_argument('--tick-rate', type=int, default=TICK_RATE, help="simulation ticks per second")
+    parser.add_argument('--mute', action='store_true', help="start without audio")
+    parser.add_argument('--full-redraw', action='store_true', help="flip the whole screen every frame instead of dirty rects")
+    parser.add_argument('--profile-out', help="record per-phase timings to FILE (.csv, .trace.json for Chrome tracing, else JSON)")
+    parser.add_argument('--profile-format', choices=['csv', 'json', 'chrome'], help="format for --profile-out instead of the file extension")
+    parser.add_argument('--record', metavar='FILE', help="log every tick's input to FILE for --replay")
+    parser.add_argument('--replay', metavar='FILE', help="play back a --record log (with --headless: as fast as possible)")
+    parser.add_argument('--bench', action='store_true', help="run the benchmark suite (options: bench.py --help)")
+    parser.add_argument('--connect', metavar='HOST:PORT', help="join a co-op server (start one with server.py)")
+    args, extra = parser.parse_known_args()
+    if args.bench:
+        import bench
+        if args.seed is not None:
+            extra += ['--seed', str(args.seed)]
+        sys.exit(bench.main(extra))
+    if extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    if args.connect:
+        import client
+        host, _, port = args.connect.rpartition(':')
+        if not host or not port.isdigit():
+            parser.error("--connect takes HOST:PORT")
+        sys.exit(client.run_client(host, int(port), not args.full_redraw))
+    log = load_replay(args.replay) if args.replay else None
+    if args.headless:
+        if args.record:
+            parser.error("--record needs a window; record a played session instead")
+        profiler = Profiler(record=True) if args.profile_out else None
+        if log is not None:
+            world, elapsed = replay_headless(log, profiler)
+        else:
+            world, elapsed = run_headless(args.ticks, args.seed, profiler=profiler, tick_rate=args.tick_rate)
+        print(f"seed {world.seed}: {world.ticks} ticks in {elapsed:.2f}s "
+              f"({world.ticks / max(elapsed, 1e-9):.0f} ticks/s), score {world.score}, "
+              f"level {world.level.num}, room {world.current_room.id}")
+        if profiler is not None:
+            fmt = profiler.dump(args.profile_out, args.profile_format)
+            print(f"Profile ({fmt}, {len(profiler.frames)} frames) written to {args.profile_out}")
+        if log is not None and not check_replay(log, world):
+            sys.exit(1)
+    else:
+        main(args.seed, not args.full_redraw, args.profile_out, args.profile_format, args.record, log,
+             args.tick_rate, not args.mute)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# hud.py - Cached font loading and text rendering for the HUD and overlays
+
+from collections import OrderedDict
+
+import pygame
+
+WHITE = (255, 255, 255)
+
+# Fonts are loaded once per (name, size), starting the font module on first
+# use; rendered text surfaces are kept in an LRU keyed by (font, text, color).
+# The default font (name None) loads straight from pygame's bundled file,
+# skipping the system font scan that SysFont does first.
+class TextCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size, name=None):
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = pygame.font.Font(None, size) if name is None else pygame.font.SysFont(name, size)
+            self.fonts[key] = font
+        return font
+
+    def render(self, text, size=24, color=WHITE, name=None):
+        key = (name, size, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = self.font(size, name).render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+# Named HUD lines that only go back to the text cache when their text changes.
+# Rects of lines that changed since the last draw are tracked so a dirty-rect
+# renderer can erase the old text and push only what moved.
+class Hud:
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else TextCache()
+        self.lines = {}  # slot -> [text, color, surface, pos]
+        self.stale = []  # rects of text replaced since the last draw
+        self.fresh = []  # rects of text (re)rendered since the last draw
+
+    def set(self, slot, text, pos, size=24, color=WHITE):
+        line = self.lines.get(slot)
+        if line is not None and line[0] == text and line[1] == color and line[3] == pos:
+            return
+        if line is not None:
+            self.stale.append(pygame.Rect(line[3], line[2].get_size()))
+        surface = self.cache.render(text, size, color)
+        self.lines[slot] = [text, color, surface, pos]
+        self.fresh.append(pygame.Rect(pos, surface.get_size()))
+
+    def remove(self, slot):
+        line = self.lines.pop(slot, None)
+        if line is not None:
+            self.stale.append(pygame.Rect(line[3], line[2].get_size()))
+
+    # Rects currently covered by text; antialiased text has to be erased before
+    # it is blitted again or its edges build up
+    def rects(self):
+        return [pygame.Rect(line[3], line[2].get_size()) for line in self.lines.values()]
+
+    # Blit every line; returns the rects that changed since the previous draw
+    def draw(self, screen):
+        screen.blits([(line[2], line[3]) for line in self.lines.values()], doreturn=False)
+        changed = self.stale + self.fresh
+        self.stale = []
+        self.fresh = []
+        return changed
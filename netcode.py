@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# netcode.py - Datagram formats for networked play: inputs up, delta-compressed snapshots down
+
+import random
+import sys
+import time
+
+from replay import DOWN, FIRING, LEFT, RIGHT, UP, read_varint, unzigzag, write_varint, zigzag
+
+PROTOCOL = 1
+
+# First byte of every datagram
+HELLO = 1  # client -> server: protocol version
+WELCOME = 2  # server -> client: client id, tick rate, ticks between snapshots
+INPUT = 3  # client -> server: held input, latest snapshot seen, unacknowledged events
+SNAPSHOT = 4  # server -> client: game state, as a delta from a snapshot the client has
+BYE = 5  # either way: leaving, or no room to join
+
+def encode_hello():
+    return bytes((HELLO, PROTOCOL))
+
+def encode_welcome(client_id, tick_rate, interval):
+    out = bytearray((WELCOME,))
+    write_varint(out, client_id)
+    write_varint(out, tick_rate)
+    write_varint(out, interval)
+    return bytes(out)
+
+def decode_welcome(data):
+    client_id, pos = read_varint(data, 1)
+    tick_rate, pos = read_varint(data, pos)
+    interval, pos = read_varint(data, pos)
+    return client_id, tick_rate, interval
+
+def encode_bye():
+    return bytes((BYE,))
+
+# Held input is sent whole in every packet, so a lost one is replaced by the
+# next. Events are numbered: each packet carries every event from first_event
+# on that the server has not acknowledged, so they arrive however many
+# packets are lost, and the server drops the ones it already applied. Event
+# codes are small ints agreed between client and server.
+def encode_input(seq, ack, inputs, first_event, events):
+    out = bytearray((INPUT,))
+    write_varint(out, seq)
+    write_varint(out, ack)
+    out.append((LEFT if inputs.left else 0) | (RIGHT if inputs.right else 0) |
+               (UP if inputs.up else 0) | (DOWN if inputs.down else 0) |
+               (FIRING if inputs.firing else 0))
+    write_varint(out, zigzag(int(inputs.mouse_x)))
+    write_varint(out, zigzag(int(inputs.mouse_y)))
+    write_varint(out, first_event)
+    write_varint(out, len(events))
+    out.extend(events)
+    return bytes(out)
+
+# (seq, ack, (left, right, up, down, mouse_x, mouse_y, firing), first_event, event codes)
+def decode_input(data):
+    seq, pos = read_varint(data, 1)
+    ack, pos = read_varint(data, pos)
+    flags = data[pos]
+    mouse_x, pos = read_varint(data, pos + 1)
+    mouse_y, pos = read_varint(data, pos)
+    first_event, pos = read_varint(data, pos)
+    count, pos = read_varint(data, pos)
+    events = data[pos:pos + count]
+    if len(events) != count:
+        raise ValueError("truncated input packet")
+    held = (bool(flags & LEFT), bool(flags & RIGHT), bool(flags & UP), bool(flags & DOWN),
+            unzigzag(mouse_x), unzigzag(mouse_y), bool(flags & FIRING))
+    return seq, ack, held, first_event, bytes(events)
+
+# A row of ints as a bit mask of the fields that differ from base, then the
+# zigzagged difference of each of those
+def write_row(out, row, base):
+    mask = 0
+    for i, (value, old) in enumerate(zip(row, base)):
+        if value != old:
+            mask |= 1 << i
+    write_varint(out, mask)
+    for i, (value, old) in enumerate(zip(row, base)):
+        if mask >> i & 1:
+            write_varint(out, zigzag(value - old))
+
+def read_row(data, pos, base):
+    mask, pos = read_varint(data, pos)
+    row = list(base)
+    i = 0
+    while mask:
+        if mask & 1:
+            delta, pos = read_varint(data, pos)
+            row[i] += unzigzag(delta)
+        mask >>= 1
+        i += 1
+    return tuple(row), pos
+
+# Ascending ints as the gaps between them
+def write_serials(out, serials):
+    write_varint(out, len(serials))
+    last = 0
+    for serial in serials:
+        write_varint(out, serial - last)
+        last = serial
+
+def read_serials(data, pos):
+    count, pos = read_varint(data, pos)
+    serials = []
+    last = 0
+    for _ in range(count):
+        gap, pos = read_varint(data, pos)
+        last += gap
+        serials.append(last)
+    return serials, pos
+
+# A snapshot is a header row plus tables, one per kind of entity, mapping
+# each entity's serial to a row of ints of the table's width. Encoded against
+# the snapshot of base_tick that the client acknowledged (base None for a
+# full one), each table carries only the serials gone since the base and the
+# rows that are new or changed, each as a delta; anything unchanged costs
+# nothing. Every value must be an int, so positions are sent quantized.
+def encode_snapshot(tick, header, tables, widths, base_tick=None, base=None):
+    if (base_tick is None) != (base is None):
+        raise ValueError("a delta snapshot needs both base_tick and base")
+    out = bytearray((SNAPSHOT,))
+    write_varint(out, tick)
+    write_varint(out, 0 if base_tick is None else base_tick)
+    if base is None:
+        base_header = (0,) * len(header)
+        base_tables = [{} for _ in tables]
+    else:
+        base_header, base_tables = base
+    write_varint(out, len(header))
+    write_row(out, header, base_header)
+    write_varint(out, len(tables))
+    for table, old, width in zip(tables, base_tables, widths):
+        write_varint(out, width)
+        write_serials(out, sorted(serial for serial in old if serial not in table))
+        changed = sorted(serial for serial, row in table.items() if old.get(serial) != row)
+        write_serials(out, changed)
+        empty = (0,) * width
+        for serial in changed:
+            write_row(out, table[serial], old.get(serial, empty))
+    return out
+
+# (tick, header, tables) from a snapshot, or None when its base is not in
+# history, a dict of tick -> (header, tables) of snapshots already decoded
+def decode_snapshot(data, history):
+    tick, pos = read_varint(data, 1)
+    base_tick, pos = read_varint(data, pos)
+    count, pos = read_varint(data, pos)
+    if base_tick:
+        if base_tick not in history:
+            return None
+        base_header, base_tables = history[base_tick]
+    else:
+        base_header = (0,) * count
+        base_tables = ()
+    header, pos = read_row(data, pos, base_header)
+    count, pos = read_varint(data, pos)
+    tables = []
+    for i in range(count):
+        table = dict(base_tables[i]) if base_tables else {}
+        width, pos = read_varint(data, pos)
+        removed, pos = read_serials(data, pos)
+        for serial in removed:
+            del table[serial]
+        changed, pos = read_serials(data, pos)
+        empty = (0,) * width
+        for serial in changed:
+            table[serial], pos = read_row(data, pos, table.get(serial, empty))
+        tables.append(table)
+    return tick, header, tables
+
+# Snapshot sizes for a room of wandering entities, full against delta-encoded
+# from the previous snapshot, and their encode and decode cost
+def benchmark(entities=(10, 50, 200), snapshots=300, seed=1):
+    rng = random.Random(seed)
+    print(f"{'entities':>9} {'full B':>7} {'delta B':>8} {'ratio':>6} {'encode us':>10} {'decode us':>10}")
+    for n in entities:
+        rows = {serial: [rng.randrange(3200), rng.randrange(2400), rng.randrange(5), 3] for serial in range(n)}
+        velocity = {serial: (rng.randint(-8, 8), rng.randint(-8, 8)) for serial in rows}
+        next_serial = n
+        history = {}
+        base = None
+        full_bytes = delta_bytes = 0
+        encode_s = decode_s = 0
+        for tick in range(1, snapshots + 1):
+            for serial, row in rows.items():
+                row[0] += velocity[serial][0]
+                row[1] += velocity[serial][1]
+            # Now and then one dies and another takes its place
+            if tick % 10 == 0:
+                del rows[rng.choice(list(rows))]
+                rows[next_serial] = [rng.randrange(3200), rng.randrange(2400), rng.randrange(5), 3]
+                velocity[next_serial] = (rng.randint(-8, 8), rng.randint(-8, 8))
+                next_serial += 1
+            header = (1, 5, 0, tick * 10)
+            tables = [{serial: tuple(row) for serial, row in rows.items()}]
+            full_bytes += len(encode_snapshot(tick, header, tables, (4,)))
+            start = time.perf_counter()
+            data = encode_snapshot(tick, header, tables, (4,), tick - 1 if base else None, base)
+            encode_s += time.perf_counter() - start
+            delta_bytes += len(data)
+            start = time.perf_counter()
+            decoded = decode_snapshot(bytes(data), history)
+            decode_s += time.perf_counter() - start
+            if decoded is None or decoded[1] != header or decoded[2] != tables:
+                print(f"snapshot {tick} with {n} entities did not survive a round trip", file=sys.stderr)
+                return
+            history = {tick: (header, tables)}
+            base = (header, tables)
+        print(f"{n:>9} {full_bytes / snapshots:>7.0f} {delta_bytes / snapshots:>8.0f} "
+              f"{full_bytes / delta_bytes:>5.1f}x {encode_s * 1e6 / snapshots:>10.1f} {decode_s * 1e6 / snapshots:>10.1f}")
+
+if __name__ == "__main__":
+    benchmark()
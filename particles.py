@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# particles.py - Array-backed particle system with vectorized update and drawing
+
+import math
+import sys
+import time
+
+import numpy as np
+import pygame
+
+# Pixel footprint of pygame.draw.circle(..., radius=2), relative to the center
+STENCIL_DX = np.array([-1, 0, -2, -1, 0, 1, -2, -1, 0, 1, -1, 0], dtype=np.int32)
+STENCIL_DY = np.array([-2, -2, -1, -1, -1, -1, 0, 0, 0, 0, 1, 1], dtype=np.int32)
+
+class ParticleSystem:
+    def __init__(self, capacity=65536, rng=None):
+        self.capacity = capacity
+        self.count = 0  # live particles are packed into [0, count)
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.vel = np.zeros((capacity, 2), dtype=np.float32)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        self.age = np.zeros(capacity, dtype=np.float32)  # in unit-length updates
+        self.lifetime = np.zeros(capacity, dtype=np.float32)
+        self.last_scale = 1.0
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    # Spawn n particles at origin flying outwards in random directions.
+    # Emissions past capacity are dropped rather than growing the buffers.
+    def emit(self, n, origin, speed_range, color, lifetime):
+        n = min(n, self.capacity - self.count)
+        if n <= 0:
+            return
+        start = self.count
+        end = start + n
+        angles = self.rng.uniform(0, 2 * math.pi, n)
+        speeds = self.rng.uniform(speed_range[0], speed_range[1], n)
+        self.pos[start:end] = origin
+        self.vel[start:end, 0] = np.cos(angles) * speeds
+        self.vel[start:end, 1] = np.sin(angles) * speeds
+        self.color[start:end] = color[:3]
+        self.age[start:end] = 0
+        self.lifetime[start:end] = lifetime
+        self.count = end
+
+    # scale is the tick length relative to the unit velocities and lifetimes
+    # are given in
+    def update(self, scale=1.0):
+        n = self.count
+        self.last_scale = scale
+        if n == 0:
+            return
+        if scale == 1:
+            self.pos[:n] += self.vel[:n]
+        else:
+            self.pos[:n] += self.vel[:n] * np.float32(scale)
+        self.age[:n] += scale
+        alive = self.age[:n] <= self.lifetime[:n]
+        kept = int(np.count_nonzero(alive))
+        if kept == n:
+            return
+        # Swap-compaction: survivors past the new end move into the holes
+        # left by expired particles, so only the expired count is copied
+        holes = np.flatnonzero(~alive[:kept])
+        movers = np.flatnonzero(alive[kept:]) + kept
+        for buf in (self.pos, self.vel, self.color, self.age, self.lifetime):
+            buf[holes] = buf[movers]
+        self.count = kept
+
+    # Positions part way back along the last update, for drawing between
+    # ticks; alpha = 1 is the current state
+    def positions(self, alpha=1):
+        n = self.count
+        if alpha >= 1:
+            return self.pos[:n]
+        return self.pos[:n] - self.vel[:n] * np.float32((1 - alpha) * self.last_scale)
+
+    # Screen rect covering every live particle, or None when there are none;
+    # offset is the screen's top-left corner in particle coordinates
+    def bounds(self, alpha=1, offset=None):
+        n = self.count
+        if n == 0:
+            return None
+        pos = self.positions(alpha)
+        if offset is not None:
+            pos = pos - np.asarray(offset, dtype=np.float32)
+        lo = pos.min(axis=0)
+        hi = pos.max(axis=0)
+        return pygame.Rect(int(lo[0]) - 2, int(lo[1]) - 2, int(hi[0]) - int(lo[0]) + 5, int(hi[1]) - int(lo[1]) + 5)
+
+    # Particles off the screen are skipped along with the clipping below
+    def draw(self, screen, alpha=1, offset=None):
+        n = self.count
+        if n == 0:
+            return
+        pos = self.positions(alpha)
+        if offset is not None:
+            pos = pos - np.asarray(offset, dtype=np.float32)
+        visible = self.age[:n] < self.lifetime[:n]
+        if visible.all():
+            centers = pos.astype(np.int32)
+            colors = self.color[:n]
+        else:
+            centers = pos[visible].astype(np.int32)
+            colors = self.color[:n][visible]
+        width, height = screen.get_size()
+        cx = centers[:, 0]
+        cy = centers[:, 1]
+        # Particles whose whole footprint is on screen take the fast path;
+        # the few straddling an edge get per-pixel clipping
+        inner = (cx >= 2) & (cx < width - 1) & (cy >= 2) & (cy < height - 1)
+        edge = ~inner & (cx >= -1) & (cx < width + 2) & (cy >= -1) & (cy < height + 2)
+        if screen.get_bytesize() == 4:
+            self._draw_packed(screen, cx, cy, colors, inner, edge)
+        else:
+            pixels = pygame.surfarray.pixels3d(screen)
+            xs = (cx[:, None] + STENCIL_DX).ravel()
+            ys = (cy[:, None] + STENCIL_DY).ravel()
+            inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+            pixels[xs[inside], ys[inside]] = np.repeat(colors, len(STENCIL_DX), axis=0)[inside]
+            del pixels
+
+    # Write mapped 32-bit pixels straight into the surface buffer
+    def _draw_packed(self, screen, cx, cy, colors, inner, edge):
+        shifts = screen.get_shifts()
+        losses = screen.get_losses()
+        mapped = np.zeros(len(colors), dtype=np.uint32)
+        for channel in range(3):
+            mapped |= (colors[:, channel].astype(np.uint32) >> losses[channel]) << shifts[channel]
+        if screen.get_flags() & pygame.SRCALPHA:
+            mapped |= np.uint32(255 >> losses[3]) << shifts[3]
+        stride = screen.get_pitch() // 4
+        buf = np.frombuffer(screen.get_buffer(), dtype=np.uint32)
+        offsets = STENCIL_DY * stride + STENCIL_DX
+        flat = cy[inner] * stride + cx[inner]
+        buf[(flat[:, None] + offsets).ravel()] = np.repeat(mapped[inner], len(offsets))
+        if edge.any():
+            width, height = screen.get_size()
+            xs = (cx[edge][:, None] + STENCIL_DX).ravel()
+            ys = (cy[edge][:, None] + STENCIL_DY).ravel()
+            inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+            buf[ys[inside] * stride + xs[inside]] = np.repeat(mapped[edge], len(offsets))[inside]
+        del buf
+
+# Benchmark: sustained emission to a target live count, timing update + draw
+def benchmark(target=50000, frames=300, width=800, height=600):
+    screen = pygame.Surface((width, height))
+    system = ParticleSystem(capacity=target + 1024, rng=np.random.default_rng(1))
+    per_frame = target // 40
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        for _ in range(per_frame // 20):
+            system.emit(20, (width / 2, height / 2), (1, 4), (255, 165, 0), 40)
+        system.update()
+        screen.fill((20, 20, 50))
+        system.draw(screen)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    print(f"live particles: {len(system)}")
+    print(f"frame ms: mean {sum(times) / len(times):.2f}  p50 {times[len(times) // 2]:.2f}  max {times[-1]:.2f}")
+    if times[len(times) // 2] > 1000 / 60:
+        print("Below 60 FPS", file=sys.stderr)
+
+if __name__ == "__main__":
+    benchmark()
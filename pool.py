@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# pool.py - Object pools and live entity lists with O(1) removal
+
+import sys
+
+# Recycles instances of a class that implements reset(*args) with the same
+# signature as its constructor. Every acquire stamps the object's `serial`
+# with a number unique within the pool, so a recycled instance is told apart
+# from its previous life.
+class Pool:
+    def __init__(self, cls):
+        self.cls = cls
+        self.free = []
+        self.created = 0
+        self.acquired = 0
+
+    def acquire(self, *args):
+        self.acquired += 1
+        try:
+            obj = self.free.pop()
+        except IndexError:
+            self.created += 1
+            obj = self.cls(*args)
+        else:
+            obj.reset(*args)
+        obj.serial = self.acquired
+        return obj
+
+    def release(self, obj):
+        self.free.append(obj)
+
+    def stats(self):
+        return {'created': self.created, 'acquired': self.acquired, 'free': len(self.free)}
+
+# Entities with an `alive` flag. kill() is O(1): the entity is flagged and
+# skipped by iteration, and compact() drops all dead entries in one stable
+# pass (handing them back to the pool) at the end of a tick. Iterating never
+# needs a copy of the list.
+class LiveList:
+    def __init__(self, items=(), pool=None):
+        self.items = []
+        self.dead = 0
+        self.pool = pool
+        for obj in items:
+            self.append(obj)
+
+    def append(self, obj):
+        obj.alive = True
+        self.items.append(obj)
+
+    def kill(self, obj):
+        if obj.alive:
+            obj.alive = False
+            self.dead += 1
+
+    def compact(self):
+        if not self.dead:
+            return
+        live = []
+        pool = self.pool
+        for obj in self.items:
+            if obj.alive:
+                live.append(obj)
+            elif pool is not None:
+                pool.release(obj)
+        self.items = live
+        self.dead = 0
+
+    def clear(self):
+        for obj in self.items:
+            obj.alive = False
+        self.dead = len(self.items)
+        self.compact()
+
+    def __iter__(self):
+        for obj in self.items:
+            if obj.alive:
+                yield obj
+
+    def __len__(self):
+        return len(self.items) - self.dead
+
+    def __bool__(self):
+        return len(self.items) > self.dead
+
+# Bytes held by one instance, including its __dict__ when it has one
+def instance_size(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
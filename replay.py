@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# replay.py - Compact binary input logs for recording and replaying sessions
+
+import json
+import os
+import struct
+import sys
+import time
+
+MAGIC = b'SKRP'
+VERSION = 3
+
+# Per-tick flag bits; a tick where nothing changed but the held keys is one byte
+LEFT = 1
+RIGHT = 2
+UP = 4
+DOWN = 8
+FIRING = 16
+MOUSE_MOVED = 32
+DT_CHANGED = 64
+HAS_EVENTS = 128
+
+def write_varint(out, value):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+# Signed deltas as unsigned varints: 0, -1, 1, -2, 2 ... -> 0, 1, 2, 3, 4 ...
+def zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+# dt is kept as a double: live ticks are 1000 / tick_rate ms, which whole
+# milliseconds would round, and replays must step with exactly the same value
+_DT = struct.Struct('<d')
+
+def write_string(out, text):
+    encoded = text.encode('utf-8')
+    write_varint(out, len(encoded))
+    out.extend(encoded)
+
+def read_string(data, pos):
+    length, pos = read_varint(data, pos)
+    return data[pos:pos + length].decode('utf-8'), pos + length
+
+# Buffers one tick of input per record() call and writes the whole log in
+# save(). Mouse position is stored as a delta from the previous tick and dt
+# as its exact value, each only when it changes; event names are interned, the first use of a
+# name writing it out in full.
+#
+# Layout: MAGIC, version, zigzag varint seed, varint tick count, the ticks, then a
+# length-prefixed JSON trailer with the world's final state.
+class Recorder:
+    def __init__(self, seed):
+        self.seed = seed
+        self.data = bytearray()
+        self.ticks = 0
+        self.mouse = (0, 0)
+        self.dt = 0
+        self.event_codes = {}
+
+    def record(self, inputs, dt):
+        out = self.data
+        mouse = (int(inputs.mouse_x), int(inputs.mouse_y))
+        flags = ((LEFT if inputs.left else 0) | (RIGHT if inputs.right else 0) |
+                 (UP if inputs.up else 0) | (DOWN if inputs.down else 0) |
+                 (FIRING if inputs.firing else 0))
+        if mouse != self.mouse:
+            flags |= MOUSE_MOVED
+        if dt != self.dt:
+            flags |= DT_CHANGED
+        if inputs.events:
+            flags |= HAS_EVENTS
+        out.append(flags)
+        if flags & DT_CHANGED:
+            out.extend(_DT.pack(dt))
+            self.dt = dt
+        if flags & MOUSE_MOVED:
+            write_varint(out, zigzag(mouse[0] - self.mouse[0]))
+            write_varint(out, zigzag(mouse[1] - self.mouse[1]))
+            self.mouse = mouse
+        if flags & HAS_EVENTS:
+            write_varint(out, len(inputs.events))
+            for event in inputs.events:
+                code = self.event_codes.get(event)
+                if code is None:
+                    # Code 0 introduces a new name, which takes the next code
+                    code = self.event_codes[event] = len(self.event_codes) + 1
+                    out.append(0)
+                    write_string(out, event)
+                else:
+                    write_varint(out, code)
+        self.ticks += 1
+
+    def save(self, path, final_state=None):
+        out = bytearray(MAGIC)
+        out.append(VERSION)
+        write_varint(out, zigzag(self.seed))  # --seed takes any int
+        write_varint(out, self.ticks)
+        out.extend(self.data)
+        write_string(out, json.dumps(final_state or {}, sort_keys=True))
+        with open(path, 'wb') as f:
+            f.write(out)
+        return len(out)
+
+# A decoded log: the seed, the recorded final state, and the ticks as
+# (dt, left, right, up, down, mouse_x, mouse_y, firing, events) tuples
+class Replay:
+    def __init__(self, seed, ticks, final_state):
+        self.seed = seed
+        self.ticks = ticks
+        self.final_state = final_state
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def __iter__(self):
+        return iter(self.ticks)
+
+def load_replay(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        raise ValueError(f"{path} is not a replay log")
+    if data[4] != VERSION:
+        raise ValueError(f"{path} is replay version {data[4]}, expected {VERSION}")
+    pos = 5
+    seed, pos = read_varint(data, pos)
+    seed = unzigzag(seed)
+    count, pos = read_varint(data, pos)
+    names = [None]
+    mouse_x = mouse_y = dt = 0
+    ticks = []
+    for _ in range(count):
+        flags = data[pos]
+        pos += 1
+        if flags & DT_CHANGED:
+            dt, = _DT.unpack_from(data, pos)
+            pos += _DT.size
+        if flags & MOUSE_MOVED:
+            delta, pos = read_varint(data, pos)
+            mouse_x += unzigzag(delta)
+            delta, pos = read_varint(data, pos)
+            mouse_y += unzigzag(delta)
+        events = ()
+        if flags & HAS_EVENTS:
+            n, pos = read_varint(data, pos)
+            events = []
+            for _ in range(n):
+                code, pos = read_varint(data, pos)
+                if code == 0:
+                    name, pos = read_string(data, pos)
+                    names.append(name)
+                    events.append(name)
+                else:
+                    events.append(names[code])
+        ticks.append((dt, bool(flags & LEFT), bool(flags & RIGHT), bool(flags & UP), bool(flags & DOWN),
+                      mouse_x, mouse_y, bool(flags & FIRING), events))
+    trailer, pos = read_string(data, pos)
+    return Replay(seed, ticks, json.loads(trailer))
+
+# Keys whose values differ between two final-state dicts
+def diff_states(expected, actual):
+    return {key: (expected.get(key), actual.get(key))
+            for key in sorted(set(expected) | set(actual))
+            if expected.get(key) != actual.get(key)}
+
+# Record an autopilot game at the default tick rate, replay it headless and
+# compare the final states; True when they match
+def check_game_round_trip(seed=5, ticks=3000):
+    import game
+    world = game.World(seed)
+    recorder = Recorder(world.seed)
+    dt = 1000 / game.TICK_RATE
+    for _ in range(ticks):
+        inputs = game.autopilot(world)
+        # The log keeps whole-pixel mouse positions, as live input has
+        inputs.mouse_x = int(inputs.mouse_x)
+        inputs.mouse_y = int(inputs.mouse_y)
+        recorder.record(inputs, dt)
+        world.step(inputs, dt)
+        if world.game_over:
+            break
+    world.close()
+    path = 'replay_round_trip.bin'
+    recorder.save(path, world.summary())
+    log = load_replay(path)
+    os.remove(path)
+    replayed, _ = game.replay_headless(log)
+    return game.check_replay(log, replayed)
+
+# Encode and decode a synthetic 10 minute session and check every tick
+# comes back as recorded, then check a real game replays exactly
+def benchmark(ticks=36000, seed=-12345):
+    class _Inputs:
+        pass
+    recorder = Recorder(seed)
+    expected = []
+    for n in range(ticks):
+        inputs = _Inputs()
+        inputs.left = (n // 90) % 4 == 0
+        inputs.right = (n // 90) % 4 == 2
+        inputs.up = (n // 150) % 3 == 0
+        inputs.down = False
+        inputs.firing = (n // 30) % 5 == 0
+        inputs.mouse_x = 400 + (n // 4) % 50
+        inputs.mouse_y = 300
+        inputs.events = ['shoot'] if n % 20 == 0 else ()
+        dt = 1000 / 60
+        recorder.record(inputs, dt)
+        expected.append((dt, inputs.left, inputs.right, inputs.up, inputs.down, inputs.mouse_x, inputs.mouse_y,
+                         inputs.firing, list(inputs.events) if inputs.events else ()))
+    path = 'replay_benchmark.bin'
+    start = time.perf_counter()
+    size = recorder.save(path)
+    replay = load_replay(path)
+    elapsed = time.perf_counter() - start
+    os.remove(path)
+    print(f"{ticks} ticks -> {size} bytes ({size / ticks:.2f} bytes/tick), "
+          f"save + load {elapsed * 1000:.1f} ms")
+    if replay.seed != seed:
+        print(f"decoded seed {replay.seed}, recorded {seed}", file=sys.stderr)
+    if len(replay) != ticks:
+        print("decoded tick count mismatch", file=sys.stderr)
+    for n, (recorded, decoded) in enumerate(zip(expected, replay)):
+        if recorded != decoded:
+            print(f"tick {n} decoded as {decoded}, recorded {recorded}", file=sys.stderr)
+            break
+    check_game_round_trip()
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# server.py - Authoritative co-op server: steps the world headless and sends each client its view
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import OrderedDict
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import game
+import netcode
+
+PORT = 47800
+SNAPSHOT_INTERVAL = 2  # ticks between snapshots
+MAX_CLIENTS = 32
+CLIENT_TIMEOUT = 5.0  # s without a packet before a client is dropped
+SENT_HISTORY = 64  # snapshots kept per client to delta against
+AOI_MARGIN = 160  # px around a client's screen it is told about
+POSITION_SCALE = 4  # positions travel as ints in quarter pixels
+
+# Events a client may send, by code; pausing and the profiler stay local
+NET_EVENTS = [game.EVENT_SWITCH_WEAPON, game.EVENT_SLASH, game.EVENT_SHOOT]
+# Snapshot tables and their rows, each an int tuple keyed by serial
+KINDS = ('players', 'enemies', 'bullets', 'coins', 'powerups')
+WIDTHS = (5, 4, 2, 2, 3)  # (x, y, health, weapon, speed), (x, y, type, health), (x, y), (x, y), (x, y, type)
+# Snapshot header: (seed, level, room id, cleared, level complete, score, last event applied)
+GAME_STATES = ['playing', 'level_complete']
+
+def quantize(value):
+    return int(round(value * POSITION_SCALE))
+
+def player_row(player):
+    return (quantize(player.x), quantize(player.y), player.health, player.weapon, player.speed)
+
+def enemy_row(enemy):
+    return (quantize(enemy.x), quantize(enemy.y), enemy.type, enemy.health)
+
+def point_row(entity):
+    return (quantize(entity.x), quantize(entity.y))
+
+def powerup_row(powerup):
+    return (quantize(powerup.x), quantize(powerup.y), powerup.type)
+
+# One connected client and what the server knows of it
+class Session:
+    def __init__(self, client_id, addr, player, now):
+        self.id = client_id
+        self.addr = addr
+        self.player = player
+        self.held = game.Inputs()
+        self.events = []  # codes received but not yet applied
+        self.input_seq = 0  # newest input packet seen; older ones are dropped
+        self.event_seq = 0  # events applied so far
+        self.acked = None  # newest snapshot tick the client has
+        self.sent = OrderedDict()  # tick -> (header, tables) sent, oldest first
+        self.last_seen = now
+        self.bytes_out = 0
+
+# Runs the game for everyone connected. Clients send input; the world steps
+# at a fixed tick rate with one player per client, and every
+# SNAPSHOT_INTERVAL ticks each client gets the state around its own player,
+# delta-encoded against the last snapshot it acknowledged (a full one until
+# it has acknowledged any). When every player is dead the world starts over
+# with the same clients.
+class GameServer(asyncio.DatagramProtocol):
+    def __init__(self, seed=None, tick_rate=game.TICK_RATE, interval=SNAPSHOT_INTERVAL, max_clients=MAX_CLIENTS):
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.interval = interval
+        self.max_clients = max_clients
+        self.transport = None
+        self.sessions = OrderedDict()  # addr -> Session, in world.players order
+        self.next_id = 1
+        self.tick_ms = []  # step plus snapshots, per tick
+        self.late_ticks = 0  # ticks that started behind schedule
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.world = None
+        self.reset()
+
+    def reset(self):
+        seed = self.seed if self.world is None else self.world.seed + 1
+        if self.world is not None:
+            self.world.close()
+        self.world = game.World(seed)
+        self.world.remove_player(self.world.player)
+        for session in self.sessions.values():
+            session.player = self.world.add_player()
+            # Serials start over in a new world, so deltas must too
+            session.acked = None
+            session.sent.clear()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.bytes_in += len(data)
+        try:
+            kind = data[0]
+            session = self.sessions.get(addr)
+            if kind == netcode.HELLO:
+                self.hello(data, addr, session)
+            elif session is None:
+                return
+            elif kind == netcode.INPUT:
+                self.input(session, data)
+            elif kind == netcode.BYE:
+                self.drop(session)
+        except (IndexError, ValueError) as e:
+            print(f"Bad packet from {addr}: {e}", file=sys.stderr)
+
+    def hello(self, data, addr, session):
+        if data[1] != netcode.PROTOCOL or (session is None and len(self.sessions) >= self.max_clients):
+            self.send(netcode.encode_bye(), addr)
+            return
+        if session is None:
+            session = Session(self.next_id, addr, self.world.add_player(), time.monotonic())
+            self.next_id += 1
+            self.sessions[addr] = session
+        # A repeated hello means the welcome was lost
+        self.send(netcode.encode_welcome(session.id, self.tick_rate, self.interval), addr)
+
+    def input(self, session, data):
+        seq, ack, held, first_event, events = netcode.decode_input(data)
+        session.last_seen = time.monotonic()
+        if ack in session.sent and (session.acked is None or ack > session.acked):
+            session.acked = ack
+            # Nothing older than the acknowledged snapshot will be a base again
+            while next(iter(session.sent)) < ack:
+                session.sent.popitem(last=False)
+        if seq <= session.input_seq:
+            return
+        session.input_seq = seq
+        session.held = game.Inputs(*held)
+        new = events[max(0, session.event_seq - first_event):]
+        session.events.extend(code for code in new if code < len(NET_EVENTS))
+        session.event_seq = max(session.event_seq, first_event + len(events))
+
+    def drop(self, session):
+        del self.sessions[session.addr]
+        self.world.remove_player(session.player)
+
+    def send(self, data, addr):
+        self.transport.sendto(data, addr)
+        self.bytes_out += len(data)
+
+    # One tick: apply everyone's input, step, and send snapshots when due
+    def tick(self, dt):
+        world = self.world
+        now = time.monotonic()
+        for session in [s for s in self.sessions.values() if now - s.last_seen > CLIENT_TIMEOUT]:
+            print(f"Client {session.id} timed out", file=sys.stderr)
+            self.drop(session)
+        inputs = []
+        for session in self.sessions.values():
+            held = session.held
+            inputs.append(game.Inputs(held.left, held.right, held.up, held.down, held.mouse_x, held.mouse_y,
+                                      held.firing, [NET_EVENTS[code] for code in session.events]))
+            session.events = []
+        world.step(inputs, dt)
+        if world.game_over:
+            print(f"All players down at level {world.level.num}, score {world.score}; restarting", file=sys.stderr)
+            self.reset()
+        if self.world.ticks % self.interval == 0 and self.sessions:
+            rows = self.rows()
+            for session in self.sessions.values():
+                self.send_snapshot(session, rows)
+
+    # Every player's row, and (serial, row) pairs of every other entity for
+    # the clients' views to pick from; built once per snapshot tick. Rooms
+    # hold a few hundred entities at most, so a scan per client beats a
+    # screen-sized query of the fine-grained collision grids.
+    def rows(self):
+        world = self.world
+        players = {session.id: player_row(session.player) for session in self.sessions.values()}
+        return players, [
+            [(enemy.serial, enemy_row(enemy)) for enemy in world.enemies],
+            [(bullet.serial, point_row(bullet)) for bullet in world.bullets],
+            [(coin.serial, point_row(coin)) for coin in world.coins],
+            [(powerup.serial, powerup_row(powerup)) for powerup in world.powerups],
+        ]
+
+    # The state around the session's player, delta-encoded against the
+    # newest snapshot it acknowledged. Every client sees all players.
+    def send_snapshot(self, session, rows):
+        world = self.world
+        room = world.current_room
+        header = (world.seed, world.level.num, room.id, int(room.cleared), GAME_STATES.index(world.game_state),
+                  world.score, session.event_seq)
+        players, others = rows
+        px, py = session.player.center()
+        x0 = quantize(px - game.SCREEN_WIDTH // 2 - AOI_MARGIN)
+        x1 = quantize(px + game.SCREEN_WIDTH // 2 + AOI_MARGIN)
+        y0 = quantize(py - game.SCREEN_HEIGHT // 2 - AOI_MARGIN)
+        y1 = quantize(py + game.SCREEN_HEIGHT // 2 + AOI_MARGIN)
+        tables = [players] + [{serial: row for serial, row in kind if x0 < row[0] < x1 and y0 < row[1] < y1}
+                              for kind in others]
+        base = session.sent.get(session.acked)
+        if base is None:
+            session.acked = None  # base gone (or none yet): send it all
+        data = netcode.encode_snapshot(world.ticks, header, tables, WIDTHS, session.acked, base)
+        session.sent[world.ticks] = (header, tables)
+        # Drop the oldest unacknowledged snapshots past SENT_HISTORY, but
+        # never the acknowledged base, which is the oldest kept
+        while len(session.sent) > SENT_HISTORY:
+            tick, entry = session.sent.popitem(last=False)
+            if tick == session.acked:
+                session.sent.popitem(last=False)
+                session.sent[tick] = entry
+                session.sent.move_to_end(tick, last=False)
+        session.bytes_out += len(data)
+        self.send(data, session.addr)
+
+    # Tick at the fixed rate until stopped or for duration s. Like the game
+    # loop, a late server catches up a few ticks at a time and then drops
+    # the backlog rather than fall further behind.
+    async def run(self, duration=None):
+        dt = 1000 / self.tick_rate
+        period = dt / 1000
+        loop = asyncio.get_running_loop()
+        start = next_tick = loop.time()
+        while duration is None or loop.time() - start < duration:
+            delay = next_tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.late_ticks += 1
+                if delay < -game.MAX_CATCH_UP_TICKS * period:
+                    next_tick = loop.time()
+                await asyncio.sleep(0)  # let packets in
+            began = time.perf_counter()
+            self.tick(dt)
+            self.tick_ms.append((time.perf_counter() - began) * 1000)
+            next_tick += period
+
+    def stats(self, elapsed):
+        ordered = sorted(self.tick_ms) or [0]
+        clients = max(1, len(self.sessions))
+        return {
+            'clients': len(self.sessions),
+            'ticks': len(self.tick_ms),
+            'tick_ms_p50': ordered[len(ordered) // 2],
+            'tick_ms_p99': ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)],
+            'tick_ms_max': ordered[-1],
+            'late_ticks': self.late_ticks,
+            'bytes_out_per_s': self.bytes_out / elapsed,
+            'bytes_out_per_client_s': self.bytes_out / elapsed / clients,
+            'bytes_in_per_s': self.bytes_in / elapsed,
+        }
+
+async def serve(host, port, seed=None, tick_rate=game.TICK_RATE, duration=None):
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(
+        lambda: GameServer(seed, tick_rate), local_addr=(host, port))
+    print(f"Serving on {host}:{port}, {tick_rate} ticks/s, snapshots every {server.interval} ticks")
+    try:
+        await server.run(duration)
+    finally:
+        transport.close()
+        server.world.close()
+    return server
+
+# Start a server and `bots` autopilot clients in one process, play for
+# `seconds`, and report the server's tick times and traffic. The bots talk
+# to the server over real loopback sockets and decode every snapshot, so
+# their cost lands on the same CPU: late ticks here overstate what a server
+# on its own would see.
+async def load_test(bots=16, seconds=10.0, seed=1, tick_rate=game.TICK_RATE, host='127.0.0.1', port=0):
+    from client import Bot
+
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(
+        lambda: GameServer(seed, tick_rate, max_clients=max(MAX_CLIENTS, bots)), local_addr=(host, port))
+    addr = transport.get_extra_info('sockname')
+    clients = []
+    for _ in range(bots):
+        clients.append(await loop.create_datagram_endpoint(Bot, remote_addr=addr))
+    start = time.perf_counter()
+    try:
+        await server.run(seconds)
+    finally:
+        elapsed = time.perf_counter() - start
+        for bot_transport, bot in clients:
+            bot.leave()
+            bot_transport.close()
+        transport.close()
+        server.world.close()
+    stats = server.stats(elapsed)
+    world = server.world
+    stats['level'] = world.level.num
+    stats['room'] = world.current_room.id
+    stats['score'] = world.score
+    stats['bot_snapshots'] = sum(bot.snapshots for _, bot in clients)
+    stats['bot_stale'] = sum(bot.stale for _, bot in clients)
+    return stats
+
+def print_stats(stats):
+    print(f"{stats['clients']} clients, {stats['ticks']} ticks: tick {stats['tick_ms_p50']:.2f} ms p50, "
+          f"{stats['tick_ms_p99']:.2f} ms p99, {stats['tick_ms_max']:.2f} ms max, {stats['late_ticks']} late")
+    print(f"out {stats['bytes_out_per_s'] / 1024:.1f} KiB/s ({stats['bytes_out_per_client_s'] / 1024:.2f} KiB/s "
+          f"per client), in {stats['bytes_in_per_s'] / 1024:.1f} KiB/s")
+    if 'bot_snapshots' in stats:
+        print(f"bots decoded {stats['bot_snapshots']} snapshots ({stats['bot_stale']} with a lost base); "
+              f"reached level {stats['level']} room {stats['room']}, score {stats['score']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soul Knight Clone co-op server")
+    parser.add_argument('--host', default='0.0.0.0', help="address to listen on")
+    parser.add_argument('--port', type=int, default=PORT, help="UDP port to listen on")
+    parser.add_argument('--seed', type=int, help="seed for the first world")
+    parser.add_argument('--tick-rate', type=int, default=game.TICK_RATE, help="simulation ticks per second")
+    parser.add_argument('--bots', type=int, help="load test: run this many autopilot clients and report")
+    parser.add_argument('--seconds', type=float, default=10.0, help="load test length")
+    args = parser.parse_args(argv)
+    if args.bots:
+        print_stats(asyncio.run(load_test(args.bots, args.seconds, 1 if args.seed is None else args.seed,
+                                          args.tick_rate)))
+        return 0
+    try:
+        asyncio.run(serve(args.host, args.port, args.seed, args.tick_rate))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
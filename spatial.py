@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# spatial.py - Uniform grid spatial hash for broadphase collision queries
+
+import random
+import sys
+import time
+
+class SpatialHash:
+    def __init__(self, cell_size=32):
+        self.cell_size = cell_size
+        self.cells = {}  # (cx, cy) -> {object: entry}
+        self.entries = {}  # object -> [order, x, y, w, h, cell]
+        self.max_w = 0
+        self.max_h = 0
+        self.next_order = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, obj):
+        return obj in self.entries
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+        self.max_w = 0
+        self.max_h = 0
+        self.next_order = 0
+
+    # Each object lives in the single cell holding its top-left corner; queries
+    # widen their search by the largest indexed box so nothing is missed.
+    def insert(self, obj, x, y, w, h):
+        if obj in self.entries:
+            self.remove(obj)
+        cs = self.cell_size
+        cell = (int(x // cs), int(y // cs))
+        entry = [self.next_order, x, y, w, h, cell]
+        self.next_order += 1
+        self.entries[obj] = entry
+        bucket = self.cells.get(cell)
+        if bucket is None:
+            self.cells[cell] = {obj: entry}
+        else:
+            bucket[obj] = entry
+        if w > self.max_w:
+            self.max_w = w
+        if h > self.max_h:
+            self.max_h = h
+
+    def remove(self, obj):
+        entry = self.entries.pop(obj, None)
+        if entry is not None:
+            bucket = self.cells[entry[5]]
+            del bucket[obj]
+            if not bucket:
+                del self.cells[entry[5]]
+
+    def _buckets(self, x, y, w, h):
+        cs = self.cell_size
+        cx0 = int((x - self.max_w) // cs)
+        cy0 = int((y - self.max_h) // cs)
+        cx1 = int((x + w) // cs)
+        cy1 = int((y + h) // cs)
+        cells = self.cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    yield bucket
+
+    # Objects whose box overlaps (x, y, w, h), using the same open-interval test
+    # as the game's brute-force checks. Results come back in insertion order so
+    # "first hit" logic matches iterating the original list.
+    def query_aabb(self, x, y, w, h):
+        hits = []
+        x1 = x + w
+        y1 = y + h
+        for bucket in self._buckets(x, y, w, h):
+            for obj, entry in bucket.items():
+                ex = entry[1]
+                ey = entry[2]
+                if x < ex + entry[3] and x1 > ex and y < ey + entry[4] and y1 > ey:
+                    hits.append((entry[0], obj))
+        if len(hits) > 1:
+            hits.sort(key=_order)
+        return [obj for _, obj in hits]
+
+    # Objects whose center is closer than r to (cx, cy). Centers follow the
+    # game's x + size//2 convention.
+    def query_radius(self, cx, cy, r):
+        hits = []
+        r2 = r * r
+        for bucket in self._buckets(cx - r, cy - r, 2 * r, 2 * r):
+            for obj, entry in bucket.items():
+                dx = entry[1] + entry[3] // 2 - cx
+                dy = entry[2] + entry[4] // 2 - cy
+                if dx * dx + dy * dy < r2:
+                    hits.append((entry[0], obj))
+        if len(hits) > 1:
+            hits.sort(key=_order)
+        return [obj for _, obj in hits]
+
+def _order(hit):
+    return hit[0]
+
+# Benchmark: bullets-vs-boxes first hit, brute force against the spatial hash
+class _Box:
+    __slots__ = ('x', 'y', 'size')
+
+    def __init__(self, x, y, size):
+        self.x = x
+        self.y = y
+        self.size = size
+
+def _brute_first_hits(bullets, boxes, half):
+    hits = []
+    for bx, by in bullets:
+        hit = None
+        for box in boxes:
+            if (bx - half < box.x + box.size and bx + half > box.x and
+                by - half < box.y + box.size and by + half > box.y):
+                hit = box
+                break
+        hits.append(hit)
+    return hits
+
+def _hash_first_hits(bullets, boxes, half, cell_size):
+    grid = SpatialHash(cell_size)
+    for box in boxes:
+        grid.insert(box, box.x, box.y, box.size, box.size)
+    hits = []
+    for bx, by in bullets:
+        found = grid.query_aabb(bx - half, by - half, half * 2, half * 2)
+        hits.append(found[0] if found else None)
+    return hits
+
+# The arena grows past one screen above 1k entities so density stays at a crowded room
+def benchmark(counts=(100, 1000, 10000), cell_size=32, seed=1):
+    rng = random.Random(seed)
+    half = 5  # BULLET_SIZE
+    print(f"{'entities':>8} {'bullets':>8} {'brute ms':>10} {'hash ms':>10} {'speedup':>8}")
+    for n in counts:
+        scale = max(1.0, n / 1000) ** 0.5
+        width, height = 800 * scale, 600 * scale
+        boxes = [_Box(rng.uniform(0, width), rng.uniform(0, height), rng.choice([12, 15, 18, 20, 25]))
+                 for _ in range(n)]
+        bullets = [(rng.uniform(0, width), rng.uniform(0, height)) for _ in range(max(1, n // 10))]
+        start = time.perf_counter()
+        brute = _brute_first_hits(bullets, boxes, half)
+        brute_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        hashed = _hash_first_hits(bullets, boxes, half, cell_size)
+        hash_ms = (time.perf_counter() - start) * 1000
+        if brute != hashed:
+            print(f"Mismatch at {n} entities", file=sys.stderr)
+            sys.exit(1)
+        print(f"{n:>8} {len(bullets):>8} {brute_ms:>10.2f} {hash_ms:>10.2f} {brute_ms / max(hash_ms, 1e-9):>7.1f}x")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# sprites.py - Pre-rendered sprite surfaces for batched blitting
+
+import numpy as np
+import pygame
+
+COLORKEY = (255, 0, 255)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+BAR_HEIGHT = 5
+
+# Rasterizes each (shape, size, color) once, drawing into a per-pixel-alpha surface
+class SpriteCache:
+    def __init__(self):
+        self.surfaces = {}
+
+    def _new_surface(self, size):
+        surface = pygame.Surface(size, pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 0))
+        return surface
+
+    # Convert a finished sprite to the display format. Sprites whose alpha is
+    # all-or-nothing become RLE colorkey surfaces, which blit much faster than
+    # per-pixel alpha; anything with partial alpha keeps its alpha channel.
+    def _finish(self, surface):
+        if pygame.display.get_surface() is None:
+            return surface
+        alpha = pygame.surfarray.array_alpha(surface)
+        if np.any((alpha != 0) & (alpha != 255)):
+            return surface.convert_alpha()
+        keyed = pygame.Surface(surface.get_size()).convert()
+        keyed.fill(COLORKEY)
+        keyed.blit(surface, (0, 0))
+        keyed.set_colorkey(COLORKEY, pygame.RLEACCEL)
+        return keyed
+
+    # Same pixels as pygame.draw.circle(screen, color, center, radius) when
+    # blitted at (center_x - radius, center_y - radius)
+    def circle(self, radius, color):
+        key = ('circle', radius, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self._new_surface((radius * 2 + 1, radius * 2 + 1))
+            pygame.draw.circle(surface, color, (radius, radius), radius)
+            surface = self._finish(surface)
+            self.surfaces[key] = surface
+        return surface
+
+    # Health bar with `filled` of its `width` pixels green; at most width + 1
+    # variants exist per bar width
+    def health_bar(self, width, filled):
+        key = ('bar', width, filled)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self._new_surface((width, BAR_HEIGHT))
+            surface.fill(RED)
+            if filled > 0:
+                surface.fill(GREEN, (0, 0, filled, BAR_HEIGHT))
+            surface = self._finish(surface)
+            self.surfaces[key] = surface
+        return surface
+
+    def __len__(self):
+        return len(self.surfaces)
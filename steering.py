@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# steering.py - Batched seek + separation steering over NumPy arrays
+
+import sys
+import time
+
+import numpy as np
+
+SMALL_CROWD = 32  # up to this many agents, every pair is checked instead of bucketing
+_NEIGHBOR_OFFSETS = [(ox, oy) for ox in (-1, 0, 1) for oy in (-1, 0, 1)]
+
+# Up to max_neighbors agents from each of the 9 cells around every agent.
+# Returns an (n, 9 * max_neighbors) index array with -1 for empty slots, so
+# the cost is bounded per agent however crowded a cell gets. Agents are
+# bucketed with a counting sort into a dense grid spanning the crowd, and
+# neighborhoods are built once per occupied cell rather than per agent.
+def neighbor_candidates(centers, cell_size, max_neighbors=8):
+    n = len(centers)
+    cells = np.floor(centers / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    grid_w = int(cells[:, 0].max()) + 1
+    grid_h = int(cells[:, 1].max()) + 1
+    cell_ids = cells[:, 0] * grid_h + cells[:, 1]
+    counts = np.bincount(cell_ids, minlength=grid_w * grid_h)
+    starts = np.cumsum(counts) - counts
+    order = np.argsort(cell_ids, kind='stable')
+    occupied = np.flatnonzero(counts)
+    occupied_x = occupied // grid_h
+    occupied_y = occupied % grid_h
+    slots = np.arange(max_neighbors)
+    table = np.full((len(occupied), len(_NEIGHBOR_OFFSETS), max_neighbors), -1, dtype=np.int64)
+    for k, (ox, oy) in enumerate(_NEIGHBOR_OFFSETS):
+        nx = occupied_x + ox
+        ny = occupied_y + oy
+        inside = (nx >= 0) & (nx < grid_w) & (ny >= 0) & (ny < grid_h)
+        neighbor = np.where(inside, nx * grid_h + ny, 0)
+        count = np.where(inside, counts[neighbor], 0)
+        index = starts[neighbor][:, None] + slots
+        table[:, k, :] = np.where(slots < count[:, None], order[np.minimum(index, n - 1)], -1)
+    slot_of_cell = np.zeros(grid_w * grid_h, dtype=np.int64)
+    slot_of_cell[occupied] = np.arange(len(occupied))
+    return table.reshape(len(occupied), -1)[slot_of_cell[cell_ids]]
+
+# Move every agent one tick: seek towards target, push apart from neighbors
+# closer than the sum of their radii, and clamp to each agent's own speed.
+# target is one point for all agents or one per agent. With separation == 0
+# (or a single agent) there is no push: each agent moves its full speed
+# straight along its seek direction, and stays put when already on target.
+# headings, if given, are unit vectors (e.g. from a flow field) used in place
+# of the straight line to target; agents whose heading is (0, 0) still seek
+# the target directly.
+def steer(pos, sizes, speeds, target, separation=1.0, max_neighbors=4, headings=None):
+    n = len(pos)
+    if n == 0:
+        return pos
+    delta = np.asarray(target, dtype=np.float64) - pos
+    dist = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+    moving = dist > 0
+    seek = np.zeros_like(pos)
+    seek[moving] = delta[moving] / dist[moving, None]
+    if headings is not None:
+        guided = (headings[:, 0] != 0) | (headings[:, 1] != 0)
+        seek[guided] = headings[guided]
+    if separation <= 0 or n == 1:
+        return pos + seek * speeds[:, None]
+
+    radii = sizes / 2
+    center_x = pos[:, 0] + radii
+    center_y = pos[:, 1] + radii
+    if n <= SMALL_CROWD:
+        owner, other = np.nonzero(~np.eye(n, dtype=bool))
+    else:
+        candidates = neighbor_candidates(np.column_stack((center_x, center_y)), float(sizes.max()), max_neighbors)
+        # Flatten to (agent, neighbor) pairs, dropping empty slots and self-pairs
+        owner = np.repeat(np.arange(n), candidates.shape[1])
+        other = candidates.ravel()
+        keep = (other >= 0) & (other != owner)
+        owner = owner[keep]
+        other = other[keep]
+    offset_x = center_x[owner] - center_x[other]
+    offset_y = center_y[owner] - center_y[other]
+    reach = radii[owner] + radii[other]
+    close = offset_x ** 2 + offset_y ** 2 < reach ** 2
+    owner = owner[close]
+    offset_x = offset_x[close]
+    offset_y = offset_y[close]
+    reach = reach[close]
+    gap = np.sqrt(offset_x ** 2 + offset_y ** 2)
+    # Agents sitting exactly on top of each other split along x by index order
+    stacked = gap == 0
+    if stacked.any():
+        offset_x[stacked] = np.sign(owner[stacked] - other[close][stacked])
+        gap[stacked] = 1.0
+    strength = (1 - gap / reach) / gap
+    push = np.empty_like(pos)
+    push[:, 0] = np.bincount(owner, weights=offset_x * strength, minlength=n)
+    push[:, 1] = np.bincount(owner, weights=offset_y * strength, minlength=n)
+
+    desired = seek + push * separation
+    length = np.sqrt(desired[:, 0] ** 2 + desired[:, 1] ** 2)
+    scale = np.where(length > 1, 1 / np.maximum(length, 1e-12), 1.0)
+    return pos + desired * (scale * speeds)[:, None]
+
+# Benchmark: a crowd converging on one point, per-tick cost at several sizes
+def benchmark(counts=(100, 1000, 2000, 5000), ticks=120, seed=1):
+    rng = np.random.default_rng(seed)
+    print(f"{'enemies':>8} {'seek ms':>9} {'steer ms':>9}")
+    for n in counts:
+        pos = rng.uniform((0, 0), (800, 600), (n, 2))
+        sizes = rng.choice([15, 12, 20, 18, 25], n).astype(np.float64)
+        speeds = rng.choice([2, 3, 1.4, 1, 0.6], n)
+        times = {}
+        for label, separation in (('seek', 0.0), ('steer', 1.0)):
+            current = pos.copy()
+            start = time.perf_counter()
+            for _ in range(ticks):
+                current = steer(current, sizes, speeds, (400, 300), separation)
+            times[label] = (time.perf_counter() - start) * 1000 / ticks
+        print(f"{n:>8} {times['seek']:>9.3f} {times['steer']:>9.3f}")
+        if n >= 2000 and times['steer'] > 1000 / 60:
+            print(f"{n} enemies over the 60 FPS budget", file=sys.stderr)
+
+if __name__ == "__main__":
+    benchmark()